@@ -1,42 +1,37 @@
-from .nodes.FluxPro import FluxProUltra
-from .nodes.IdeogramV2 import IdeogramV2Turbo
-from .nodes.Kling import KlingImageToVideo
-from .nodes.LLM import LLMTask
-from .nodes.Runway import RunwayGen3ImageToVideo
-from .nodes.SaveImage import SaveImage
-from .nodes.SaveVideo import SaveVideo
-from .nodes.wan2 import Wan2ImageToVideo
-from .nodes.HiDreamI1 import HiDreamI1
-from .nodes.LoadImage import LoadImage
-from .nodes.Luma import LumaRay2ImageToVideo
-from .nodes.Hailuo import Hailuo01ImageToVideo
+import importlib
 
-NODE_CLASS_MAPPINGS = {
-    "Wan2ImageToVideo": Wan2ImageToVideo,
-    "LLMTask": LLMTask,
-    "FluxProUltra": FluxProUltra,
-    "IdeogramV2Turbo": IdeogramV2Turbo,
-    "RunwayGen3ImageToVideo": RunwayGen3ImageToVideo,
-    "KlingImageToVideo": KlingImageToVideo,
-    "HiDreamI1": HiDreamI1,
-    "HFLowLoadImage": LoadImage,
-    "LumaRay2ImageToVideo": LumaRay2ImageToVideo,
-    "Hailuo01ImageToVideo": Hailuo01ImageToVideo
-}
+from .nodes import metrics, webhook
+from .nodes.utils import register_route
 
-NODE_DISPLAY_NAME_MAPPINGS = {
-  "Wan2ImageToVideo": "Wan2-1 Image To Video",
-  "LLMTask": "LLM Task",
-  "FluxProUltra": "FluxPro Ultra",
-  "IdeogramV2Turbo": "IdeogramV2 Turbo",
-  "RunwayGen3ImageToVideo": "Runway Gen3 Image To Video",
-  "KlingImageToVideo": "Kling Image To Video",
-  "HiDreamI1": "HiDream I1",
-  "HFLowLoadImage": "HFLow Load Image",
-  "LumaRay2ImageToVideo": "Luma Ray2 Image To Video",
-  "Hailuo01ImageToVideo": "Hailuo01 Image To Video"
-}
+# 节点清单：(节点名, 模块, 类名, 显示名)
+# 节点模块只依赖标准库和 folder_paths，HTTP 客户端、缓存等在节点首次执行时才加载
+NODE_MANIFEST = [
+    ("Wan2ImageToVideo", ".nodes.wan2", "Wan2ImageToVideo", "Wan2-1 Image To Video"),
+    ("LLMTask", ".nodes.LLM", "LLMTask", "LLM Task"),
+    ("FluxProUltra", ".nodes.FluxPro", "FluxProUltra", "FluxPro Ultra"),
+    ("IdeogramV2Turbo", ".nodes.IdeogramV2", "IdeogramV2Turbo", "IdeogramV2 Turbo"),
+    ("RunwayGen3ImageToVideo", ".nodes.Runway", "RunwayGen3ImageToVideo", "Runway Gen3 Image To Video"),
+    ("KlingImageToVideo", ".nodes.Kling", "KlingImageToVideo", "Kling Image To Video"),
+    ("HiDreamI1", ".nodes.HiDreamI1", "HiDreamI1", "HiDream I1"),
+    ("HFLowLoadImage", ".nodes.LoadImage", "LoadImage", "HFLow Load Image"),
+    ("LumaRay2ImageToVideo", ".nodes.Luma", "LumaRay2ImageToVideo", "Luma Ray2 Image To Video"),
+    ("Hailuo01ImageToVideo", ".nodes.Hailuo", "Hailuo01ImageToVideo", "Hailuo01 Image To Video"),
+    ("HFLowBatchImage", ".nodes.BatchImage", "BatchImageGenerate", "HFLow Batch Image"),
+    ("HFLowSaveImage", ".nodes.SaveImage", "SaveImage", "HFLow Save Image"),
+    ("HFLowSaveVideo", ".nodes.SaveVideo", "SaveVideo", "HFLow Save Video"),
+]
+
+NODE_CLASS_MAPPINGS = {}
+NODE_DISPLAY_NAME_MAPPINGS = {}
+
+for node_name, module_name, class_name, display_name in NODE_MANIFEST:
+    module = importlib.import_module(module_name, __name__)
+    NODE_CLASS_MAPPINGS[node_name] = getattr(module, class_name)
+    NODE_DISPLAY_NAME_MAPPINGS[node_name] = display_name
+
+register_route("post", webhook.WEBHOOK_ROUTE, webhook.handle_webhook)
+register_route("get", metrics.METRICS_ROUTE, metrics.handle_metrics)
 
 WEB_DIRECTORY = "./web"
 
-__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', "WEB_DIRECTORY"]
\ No newline at end of file
+__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', "WEB_DIRECTORY"]
@@ -0,0 +1,134 @@
+import itertools
+
+import folder_paths
+from .utils import get_comfyonline_api_key, async_node
+from .polling_policy import policy_key
+
+# 批量节点支持的模型：接口、可选的宽高比（以及可选的通用写法映射）、其余参数的默认值，以及与单个节点相同的轮询统计参数
+BATCH_MODELS = {
+    "FluxProUltra": {
+        "endpoint": "un-api/create_flux_pro_ultra_task",
+        "filename_prefix": "FluxPro",
+        "aspect_ratios": ["1:1", "16:9", "9:16", "4:3", "3:4"],
+        "params": {"raw": False},
+        "policy_params": ("raw",),
+        "seed": True,
+    },
+    "IdeogramV2Turbo": {
+        "endpoint": "un-api/create_ideogram_v2_turbo_task",
+        "filename_prefix": "IdeogramV2",
+        "aspect_ratios": ["1:1", "16:9", "9:16", "4:3", "3:4"],
+        "params": {"style": "auto"},
+        "policy_params": (),
+        "seed": False,
+    },
+    "HiDreamI1": {
+        "endpoint": "un-api/create_hidream_i1_task",
+        "filename_prefix": "HiDreamI1",
+        "aspect_ratios": ["square", "square_hd", "portrait_4_3", "portrait_16_9", "landscape_4_3", "landscape_16_9"],
+        # 通用的宽高比写法对应的 HiDream 尺寸名
+        "aspect_ratio_aliases": {"1:1": "square_hd", "16:9": "landscape_16_9", "9:16": "portrait_16_9",
+                                 "4:3": "landscape_4_3", "3:4": "portrait_4_3"},
+        "params": {"type": "hidream-i1-full"},
+        "policy_params": ("type",),
+        "seed": True,
+    },
+}
+
+
+ASPECT_RATIOS_TOOLTIP = "Comma separated, e.g. 1:1, 16:9, 9:16. Valid values:\n" + "\n".join(
+    f"{model}: {', '.join(list(spec.get('aspect_ratio_aliases', {})) + spec['aspect_ratios'])}"
+    for model, spec in BATCH_MODELS.items())
+
+
+def parse_list(text, separator="\n"):
+    """按分隔符拆分并去掉空白项"""
+    return [item.strip() for item in text.split(separator) if item.strip()]
+
+
+@async_node
+class BatchImageGenerate:
+    """
+    批量提交 提示词 × 宽高比 的所有组合
+
+    所有任务同时提交，由限流器控制实际并发，总耗时取决于最慢的任务而不是所有任务之和。
+    输出按 提示词、宽高比 的顺序排列，每行一个地址，可以直接连接到 HFLowSaveImage。
+    """
+
+    def __init__(self):
+        self.output_dir = folder_paths.get_output_directory()
+        self.type = "output"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "model": (list(BATCH_MODELS), {"default": "FluxProUltra"}),
+                "prompts": ("STRING", {"multiline": True, "tooltip": "One prompt per line."}),
+                "aspect_ratios": ("STRING", {"default": "1:1", "tooltip": ASPECT_RATIOS_TOOLTIP}),
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("output_urls",)
+    FUNCTION = "generate_images"
+    CATEGORY = "H-flow.Image"
+    OUTPUT_NODE = True
+
+    def generate_images(self, model, prompts, aspect_ratios, seed):
+        api_token = get_comfyonline_api_key()
+        if not api_token:
+            return ("Error: No API token provided. Please set COMFYONLINE_TOKEN environment variable.",)
+
+        spec = BATCH_MODELS[model]
+        prompt_list = parse_list(prompts)
+        aliases = spec.get("aspect_ratio_aliases", {})
+        aspect_ratio_list = [aliases.get(ratio, ratio) for ratio in parse_list(aspect_ratios, ",")]
+        invalid = [ratio for ratio in aspect_ratio_list if ratio not in spec["aspect_ratios"]]
+        if invalid:
+            return (f"Error: {model} does not support aspect ratio {', '.join(invalid)}",)
+        if not prompt_list or not aspect_ratio_list:
+            return ("Error: No prompts or aspect ratios provided",)
+
+        jobs = list(itertools.product(prompt_list, aspect_ratio_list))
+        print(f"Submitting {len(jobs)} {model} tasks")
+
+        import concurrent.futures
+        from .task_client import get_task_client, api_url
+        import comfy.utils
+        client = get_task_client()
+        futures = {}
+        for index, (prompt, aspect_ratio) in enumerate(jobs):
+            payload = {"prompt": prompt, "aspect_radio": aspect_ratio, **spec["params"]}
+            if spec["seed"]:
+                payload["seed"] = seed
+            coro = client.run_media_task(
+                model, api_url(spec["endpoint"]), payload,
+                output_dir=self.output_dir, filename_prefix=spec["filename_prefix"], extension="png",
+                ui_key="images", output_type=self.type, tag=f"{model} [{index + 1}/{len(jobs)}]",
+                policy_key=policy_key(model, **{name: spec["params"][name] for name in spec["policy_params"]}))
+            futures[client.submit(coro)] = index
+
+        # 任务完成一个就更新一次进度，结果按提交顺序放回
+        progress = comfy.utils.ProgressBar(len(jobs))
+        outputs = [None] * len(jobs)
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            try:
+                outputs[index] = future.result()
+            except Exception as e:
+                print(f"Error in BatchImageGenerate ({jobs[index][0]!r}, {jobs[index][1]}): {str(e)}")
+                outputs[index] = e
+            progress.update(1)
+
+        output_urls = []
+        images = []
+        for output in outputs:
+            if isinstance(output, Exception):
+                # 保留失败的位置，使输出的顺序与 提示词 × 宽高比 一一对应
+                output_urls.append(f"Error: {str(output)}")
+            else:
+                output_urls.append(output["result"][1])
+                images.extend(output["ui"]["images"])
+        return {"ui": {"images": images}, "result": ("\n".join(output_urls),)}
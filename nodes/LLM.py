@@ -1,10 +1,52 @@
-import json
 import time
-import requests
-import os
-import folder_paths
-from .utils import get_comfyonline_api_key
+import unicodedata
 
+from .utils import get_comfyonline_api_key, payload_hash, async_node
+from .polling_policy import policy_key
+
+# 流式模式下查询部分结果的间隔（秒）
+STREAM_POLLING_INTERVAL = 1
+# 最长等待时间（秒），超过后不再从任务日志中继续该任务
+MAX_POLL_TIME = 360
+# 推送给前端 web/text.js 的部分结果事件
+PARTIAL_TEXT_EVENT = "hflow.llm.partial"
+
+# 节点上的模型名 -> comfyonline 的模型 ID
+MODEL_IDS = {
+    "gpt-4o-mini": "OpenAI-gpt-4o-mini",
+    "gpt-4o": "OpenAI-gpt-4o",
+    "deepseek-r1": "Deepseek-deepseek-reasoner",
+    "gemini-2.0-flash": "Gemini-gemini-2.0-flash",
+    "claude-3-7-sonnet": "Claude-claude-3-7-sonnet-20250219",
+    "claude-3-5-sonnet": "Claude-claude-3-5-sonnet-20241022",
+}
+
+
+def normalize_text(text):
+    """统一 Unicode 形式、换行符和每行末尾的空白，只影响缓存 key"""
+    text = unicodedata.normalize("NFC", text or "").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def llm_cache_key(model, prompt, context):
+    """LLM 响应缓存的 key：规范化后的模型 ID、提示词和上下文"""
+    return payload_hash("LLMTask", {
+        "model": MODEL_IDS.get(model, model),
+        "prompt": normalize_text(prompt),
+        "context": normalize_text(context),
+    })
+
+
+def extract_content(llm_output):
+    """从 llm_output 中取出文本，兼容完整结果的 message 和部分结果的 delta"""
+    choices = (llm_output or {}).get('choices') or []
+    if not choices:
+        return None
+    message = choices[0].get('message') or choices[0].get('delta') or {}
+    return message.get('content')
+
+
+@async_node
 class LLMTask:
     @classmethod
     def INPUT_TYPES(cls):
@@ -18,7 +60,12 @@ class LLMTask:
             },
             "optional": {
                 "context": ("STRING", {"default": '', "forceInput": True}),
-            }
+                # 生成过程中频繁查询部分结果并实时显示在节点上
+                "stream": ("BOOLEAN", {"default": False}),
+                # 跳过响应缓存，总是重新请求（新结果仍会写入缓存）
+                "bypass_cache": ("BOOLEAN", {"default": False}),
+            },
+            "hidden": {"unique_id": "UNIQUE_ID"},
         }
     
     RETURN_TYPES = ("STRING",)
@@ -27,50 +74,48 @@ class LLMTask:
     CATEGORY = "LLM"
     OUTPUT_NODE = True
 
-    def execute(self, model, prompt, context=""):
+    def execute(self, model, prompt, context="", stream=False, bypass_cache=False, unique_id=None):
+        started_at = time.time()
+        from .result_cache import get_llm_cache, llm_cache_enabled
+        cache = get_llm_cache() if llm_cache_enabled() else None
+        cache_key = llm_cache_key(model, prompt, context)
+        if cache is not None and not bypass_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"LLM response cache hit (hits: {cache.hits}, misses: {cache.misses})")
+                content = (cached["content"],)
+                return {"ui": {"text": content}, "result": content}
+
         # 创建 LLM 任务
         if context:
             prompt = prompt + "\n" + "context:" + context
-        task_id = self.create_llm_task(prompt, model)
-        print(f"task_id {task_id}")
-        if not task_id:
+        task = self.create_llm_task(prompt, model)
+        if not task:
             return ("Failed to create LLM task",)
-        
-        # 轮询任务状态
-        content = self.poll_task_status(task_id)
+        print(f"task_id {task['task_id']}")
+
+        # 等待 webhook 回调或轮询任务状态
+        on_update = self._stream_partial_text(unique_id, started_at, task["task_id"]) if stream else None
+        content = self.poll_task_status(task["task_id"], model, webhook=task["webhook"], on_update=on_update)
+        from .metrics import get_metrics
+        get_metrics().observe("total", "LLMTask", time.time() - started_at, task_id=task["task_id"])
+        # 只缓存成功的结果，失败时返回的是错误信息字符串
+        if cache is not None and isinstance(content, tuple):
+            cache.put(cache_key, {"content": content[0]}, len(content[0].encode("utf-8")))
         return {"ui": {"text": content}, "result": content}
     
     def create_llm_task(self, prompt, model, context=""):
-        url = "https://api.comfyonline.app/api/un-api/create_LLM_task"
+        from .task_client import api_url
+        url = api_url("un-api/create_LLM_task")
         
     
-        if model == "gpt-4o-mini":
-            model = "OpenAI-gpt-4o-mini"
-        
-        if model == "gpt-4o":
-            model = "OpenAI-gpt-4o"
-        
-        if model == "deepseek-r1":
-            model = "Deepseek-deepseek-reasoner"
-        
-        if model == "gemini-2.0-flash":
-            model = "Gemini-gemini-2.0-flash"
-        
-        if model == "claude-3-7-sonnet":
-            model = "Claude-claude-3-7-sonnet-20250219"
-            
-        if model == "claude-3-5-sonnet":
-            model = "Claude-claude-3-5-sonnet-20241022"
-            
-        
-        
-        
-        
+        model = MODEL_IDS.get(model, model)
+
         # 构建请求体
         body = {
             "prompt": prompt,
             "model": model,
-            "webhook": "",  # 不使用 webhook，我们将通过轮询获取结果
+            "webhook": "",  # 配置了 webhook_base_url 时由 submit_task 填入本进程的回调地址，否则通过轮询获取结果
         }
         
         print("start create llm task")
@@ -80,69 +125,65 @@ class LLMTask:
         
         api_token = get_comfyonline_api_key()
         if not api_token:
-            return ("Error: No API token provided. Please set COMFYONLINE_TOKEN environment variable.",)
-        
-        print(f"api_token {api_token}")
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_token}'  # 空令牌，实际应用中可能需要配置
-        }
+            print("Error: No API token provided. Please set COMFYONLINE_TOKEN environment variable.")
+            return None
         
         try:
-            response = requests.post(url, headers=headers, json=body)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data and 'data' in data and 'task_id' in data['data']:
-                return data['data']['task_id']
-            else:
-                print(f"Error creating LLM task: {data}")
-                return None
+            from .task_client import get_task_client
+            client = get_task_client()
+            return client.run(client.submit_task("LLMTask", url, body, rate_limit_key=f"create_LLM_task.{model}",
+                                                 webhook=True, max_wait_time=MAX_POLL_TIME))
         except Exception as e:
             print(f"Exception when creating LLM task: {e}")
             return None
     
-    def poll_task_status(self, task_id):
-        url = "https://api.comfyonline.app/api/query_app_general_detail"
-        api_token = get_comfyonline_api_key()
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_token}'  # 空令牌，实际应用中可能需要配置
-        }
-        body = {
-            "task_id": task_id
-        }
-        
-        # 固定参数：5秒间隔，最大360秒
+    def _stream_partial_text(self, unique_id, started_at, task_id):
+        """返回处理部分结果的回调：文本有变化时推送到前端，并记录首个 token 的耗时"""
+        from server import PromptServer
+        state = {"text": None}
+
+        def on_update(query_data):
+            text = extract_content(query_data.get('llm_output'))
+            if not text or text == state["text"]:
+                return
+            if state["text"] is None:
+                ttft = time.time() - started_at
+                print(f"LLM time to first token: {ttft:.2f}s")
+                from .metrics import get_metrics
+                get_metrics().observe("first_token", "LLMTask", ttft, task_id=task_id)
+            state["text"] = text
+            PromptServer.instance.send_sync(PARTIAL_TEXT_EVENT, {"node": unique_id, "text": text})
+
+        return on_update
+
+    def poll_task_status(self, task_id, model=None, webhook=False, on_update=None):
+        # 最大等待360秒，轮询间隔由 PollingPolicy 按模型自适应，没有模型信息时固定5秒
+        # 流式模式（on_update 不为空）下每秒查询一次部分结果
         poll_interval = 5
-        max_poll_time = 360
-        
-        start_time = time.time()
-        while time.time() - start_time < max_poll_time:
-            try:
-                response = requests.post(url, headers=headers, json=body)
-                response.raise_for_status()
-                data = response.json()
-                print(f"data {data}")
-                if 'data' in data and 'status' in data['data']:
-                    if data['data']['status'] == 'COMPLETED':
-                        if 'llm_output' in data['data'] and 'choices' in data['data']['llm_output'] and len(data['data']['llm_output']['choices']) > 0:
-                            message = data['data']['llm_output']['choices'][0]['message']
-                            if 'content' in message:
-                                return (message['content'],)
-                            else:
-                                return "LLM task completed but no content found in response"
-                        else:
-                            return "LLM task completed but response format is unexpected"
-                    elif data['data']['status'] == 'FAILED':
-                        error_message = data['data'].get('error_message', 'Unknown error')
-                        return f"LLM task failed: {error_message}"
-                    # 如果状态是 IN_PROGRESS，继续轮询
-                
-                # 等待指定的轮询间隔
-                time.sleep(poll_interval)
-            except Exception as e:
-                print(f"Exception when polling task status: {e}")
-                time.sleep(poll_interval)
-        
-        return "LLM task timed out after waiting for maximum poll time"
+        if on_update is not None:
+            poll_interval = STREAM_POLLING_INTERVAL
+            model = None
+            webhook = False
+
+        from .task_client import get_task_client, TaskFailedError, TaskTimeoutError
+        client = get_task_client()
+        try:
+            data = client.run(client.wait_for_task(task_id, max_wait_time=MAX_POLL_TIME,
+                                                   polling_interval=poll_interval, tag="LLM",
+                                                   policy_key=policy_key("LLMTask", model=model) if model else None,
+                                                   webhook=webhook, on_update=on_update, node_class="LLMTask"))
+        except TaskFailedError as e:
+            return f"LLM task failed: {e.error_message}"
+        except TaskTimeoutError:
+            return "LLM task timed out after waiting for maximum poll time"
+        except Exception as e:
+            return f"LLM task failed: {e}"
+
+        if 'llm_output' in data and 'choices' in data['llm_output'] and len(data['llm_output']['choices']) > 0:
+            message = data['llm_output']['choices'][0]['message']
+            if 'content' in message:
+                return (message['content'],)
+            else:
+                return "LLM task completed but no content found in response"
+        else:
+            return "LLM task completed but response format is unexpected"
@@ -1,15 +1,18 @@
-import os
 import folder_paths
-import hashlib
+from .file_digest import get_file_digest_cache
+from .input_index import get_input_index
+from .utils import get_comfyonline_config
 
 
 class LoadImage:
     @classmethod
     def INPUT_TYPES(s):
         input_dir = folder_paths.get_input_directory()
-        files = [f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))]
+        # 目录没有变化时直接使用缓存的排序结果
+        include_subfolders = get_comfyonline_config().getboolean("load_image", "include_subfolders", fallback=False)
+        files = get_input_index().list_files(input_dir, include_subfolders)
         return {"required":
-                    {"image": (sorted(files), {"image_upload": True})},
+                    {"image": (files, {"image_upload": True})},
                 }
 
     CATEGORY = "H-flow.Input"
@@ -24,10 +27,8 @@ class LoadImage:
     @classmethod
     def IS_CHANGED(s, image):
         image_path = folder_paths.get_annotated_filepath(image)
-        m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
-        return m.digest().hex()
+        # 文件未变化时直接返回缓存的摘要，不再读取整个文件
+        return get_file_digest_cache().digest(image_path)
 
     @classmethod
     def VALIDATE_INPUTS(s, image):
@@ -1,7 +1,5 @@
 import os
-import json
 import folder_paths
-import requests
 
 class SaveImage:
     def __init__(self):
@@ -44,35 +42,32 @@ class SaveImage:
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(
             filename_prefix, self.output_dir, 0, 0)
         
-        for (batch_number, url) in enumerate(urls):
-            try:
-                # Create filename
-                filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
-                file = f"{filename_with_batch_num}_{counter:05}_.png"
-                output_path = os.path.join(full_output_folder, file)
-                
-                # Download the image directly to disk with minimal memory usage
-                response = requests.get(url, stream=True, timeout=10)
-                response.raise_for_status()
-                
-                # Save the downloaded image directly to disk
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                
-                results.append({
-                    "filename": file,
-                    "subfolder": subfolder,
-                    "type": self.type,
-                    "url": url
-                })
-                counter += 1
-                
-                print(f"Successfully downloaded and saved image from {url} to {output_path}")
-                
-            except Exception as e:
-                print(f"Error downloading or saving image from URL {url}: {str(e)}")
+        # 先并发下载到临时文件，再按输入顺序命名，保证文件名和结果顺序与逐个下载时一致
+        temp_paths = [os.path.join(full_output_folder, f".{filename}_{batch_number}.download")
+                      for batch_number in range(len(urls))]
+        from .task_client import get_task_client
+        client = get_task_client()
+        errors = client.run(client.download_many(list(zip(urls, temp_paths)), timeout=10))
+
+        for (batch_number, url), temp_path, error in zip(enumerate(urls), temp_paths, errors):
+            if error is not None:
+                print(f"Error downloading or saving image from URL {url}: {str(error)}")
                 continue
-        
+
+            # Create filename
+            filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
+            file = f"{filename_with_batch_num}_{counter:05}_.png"
+            output_path = os.path.join(full_output_folder, file)
+            os.replace(temp_path, output_path)
+
+            results.append({
+                "filename": file,
+                "subfolder": subfolder,
+                "type": self.type,
+                "url": url
+            })
+            counter += 1
+
+            print(f"Successfully downloaded and saved image from {url} to {output_path}")
+
         return {"ui": {"images": results}}
\ No newline at end of file
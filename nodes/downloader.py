@@ -0,0 +1,149 @@
+import asyncio
+import os
+import re
+
+import aiohttp
+
+from .upload_manager import file_sha256
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 256 * 1024
+# 超过该大小且服务端支持 Range 时，分段并行下载
+SEGMENT_THRESHOLD = 64 * 1024 * 1024
+SEGMENT_SIZE = 32 * 1024 * 1024
+MAX_SEGMENTS = 4
+MAX_ATTEMPTS = 5
+# 禁止压缩传输，保证写入的字节数与 Content-Length/Content-Range 一致
+REQUEST_HEADERS = {'Accept-Encoding': 'identity'}
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RangeDownloader:
+    """
+    可断点续传的下载器
+
+    先写入 <output_path>.part，下载完成并校验长度（和可选的 sha256）后原子重命名为目标文件。
+    网络中断时用 HTTP Range 从已写入的位置继续；大文件在服务端支持 Range 时分段并行下载。
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, max_attempts=MAX_ATTEMPTS):
+        self._session = session
+        self._max_attempts = max_attempts
+
+    async def download(self, url, output_path, timeout=10, expected_sha256=None):
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        temp_path = output_path + ".part"
+        try:
+            total, accept_ranges = await self._probe(url, client_timeout)
+            if total and accept_ranges and total >= SEGMENT_THRESHOLD:
+                await self._download_segments(url, temp_path, total, client_timeout)
+            else:
+                total = await self._download_stream(url, temp_path, total, client_timeout)
+
+            size = os.path.getsize(temp_path)
+            if total is not None and size != total:
+                raise DownloadError(f"Downloaded {size} bytes, expected {total}")
+            if expected_sha256 and file_sha256(temp_path) != expected_sha256.lower():
+                raise DownloadError("Checksum mismatch")
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    async def _probe(self, url, client_timeout):
+        """返回 (文件大小, 是否支持 Range)，HEAD 不可用时返回 (None, False)"""
+        try:
+            async with self._session.head(url, headers=REQUEST_HEADERS, timeout=client_timeout,
+                                          allow_redirects=True) as response:
+                if response.status >= 400:
+                    return None, False
+                length = response.headers.get('Content-Length')
+                accept_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                return (int(length) if length else None), accept_ranges
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None, False
+
+    async def _download_stream(self, url, temp_path, total, client_timeout):
+        """单连接下载，中断后用 Range 从已写入的位置继续，返回文件总大小（未知时为 None）"""
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        for attempt in range(self._max_attempts):
+            offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            if total is not None and offset >= total:
+                return total
+            headers = dict(REQUEST_HEADERS)
+            if offset:
+                headers['Range'] = f'bytes={offset}-'
+            try:
+                async with self._session.get(url, headers=headers, timeout=client_timeout) as response:
+                    response.raise_for_status()
+                    if offset and response.status != 206:
+                        # 服务端不支持 Range，从头开始
+                        offset = 0
+                    total = _total_size(response, total)
+                    with open(temp_path, 'r+b' if offset else 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                        f.seek(offset)
+                        f.truncate()
+                        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                            f.write(chunk)
+                if total is None or os.path.getsize(temp_path) >= total:
+                    return total
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self._max_attempts - 1:
+                    raise
+                print(f"Download interrupted ({e}), resuming {url}")
+            await asyncio.sleep(min(2 ** attempt, 10))
+        raise DownloadError(f"Download incomplete after {self._max_attempts} attempts")
+
+    async def _download_segments(self, url, temp_path, total, client_timeout):
+        with open(temp_path, 'wb') as f:
+            f.truncate(total)
+        segment_size = max(SEGMENT_SIZE, -(-total // MAX_SEGMENTS))
+        segments = [(start, min(start + segment_size, total) - 1) for start in range(0, total, segment_size)]
+        semaphore = asyncio.Semaphore(MAX_SEGMENTS)
+
+        async def fetch(start, end):
+            async with semaphore:
+                await self._download_segment(url, temp_path, start, end, client_timeout)
+
+        await asyncio.gather(*(fetch(start, end) for start, end in segments))
+
+    async def _download_segment(self, url, temp_path, start, end, client_timeout):
+        position = start
+        for attempt in range(self._max_attempts):
+            try:
+                headers = dict(REQUEST_HEADERS, Range=f'bytes={position}-{end}')
+                async with self._session.get(url, headers=headers, timeout=client_timeout) as response:
+                    response.raise_for_status()
+                    if response.status != 206:
+                        raise DownloadError("Server ignored Range request")
+                    with open(temp_path, 'r+b', buffering=WRITE_BUFFER_SIZE) as f:
+                        f.seek(position)
+                        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                            chunk = chunk[:end + 1 - position]
+                            f.write(chunk)
+                            position += len(chunk)
+                if position > end:
+                    return
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self._max_attempts - 1:
+                    raise
+                print(f"Segment {start}-{end} interrupted ({e}), resuming at {position}")
+            await asyncio.sleep(min(2 ** attempt, 10))
+        raise DownloadError(f"Segment {start}-{end} incomplete after {self._max_attempts} attempts")
+
+
+def _total_size(response, known_total):
+    content_range = response.headers.get('Content-Range')
+    if content_range:
+        match = re.match(r'bytes \d+-\d+/(\d+)', content_range)
+        if match:
+            return int(match.group(1))
+    length = response.headers.get('Content-Length')
+    if length and response.status == 200:
+        return int(length)
+    return known_total
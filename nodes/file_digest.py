@@ -0,0 +1,87 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+DIGEST_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "file_digests.json")
+
+MAX_ENTRIES = 10000
+# 超过该大小的文件通过 mmap 计算哈希
+MMAP_THRESHOLD = 4 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def blake2b_file(path):
+    m = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                m.update(mm)
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                m.update(chunk)
+    return m.hexdigest()
+
+
+class FileDigestCache:
+    """
+    文件摘要缓存
+
+    按 (路径, inode, 大小, mtime_ns) 缓存 BLAKE2b 摘要，文件没有变化时不再读取内容。
+    缓存保存在 file_digests.json，ComfyUI 重启后依然有效。
+    """
+
+    def __init__(self, path=DIGEST_CACHE_PATH, max_entries=MAX_ENTRIES):
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        tmp_path = self._path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            print(f"Failed to save file digests: {e}")
+
+    def digest(self, path):
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        signature = f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        with self._lock:
+            entry = self._entries.get(real_path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(real_path)
+                return entry[1]
+
+        digest = blake2b_file(real_path)
+        with self._lock:
+            self._entries[real_path] = [signature, digest]
+            self._entries.move_to_end(real_path)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+        return digest
+
+
+_file_digest_cache = None
+
+
+def get_file_digest_cache() -> FileDigestCache:
+    global _file_digest_cache
+    if _file_digest_cache is None:
+        _file_digest_cache = FileDigestCache()
+    return _file_digest_cache
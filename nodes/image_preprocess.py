@@ -0,0 +1,106 @@
+import os
+import threading
+
+import folder_paths
+
+from .utils import get_comfyonline_config
+
+# 各服务会把输入图缩放到的最长边，超过的部分上传了也会被丢弃
+PROVIDER_MAX_DIMENSIONS = {
+    "kling": 1920,
+    "runway": 1280,
+    "luma": 1920,
+    "hailuo": 1920,
+    "wan2": 1280,
+}
+DEFAULT_MAX_DIMENSION = 2048
+JPEG_QUALITY = 92
+WEBP_QUALITY = 90
+
+
+def preprocess_enabled():
+    config = get_comfyonline_config()
+    return config.getboolean("image_preprocess", "enabled", fallback=False)
+
+
+class ImagePreprocessor:
+    """
+    上传前的图片预处理
+
+    按服务的最大尺寸等比缩小，去掉 EXIF 等元数据，不透明图片转为高质量 JPEG，带透明通道的转为 WebP。
+    结果按源文件内容哈希缓存在临时目录，处理后反而更大时使用原图。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (路径, mtime_ns, 大小, provider) -> 处理后的路径
+        self._processed = {}
+
+    def _cache_dir(self):
+        cache_dir = os.path.join(folder_paths.get_temp_directory(), "hflow_preprocess")
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    def process(self, path, provider):
+        """
+        返回预处理后的文件路径，Pillow 不可用或处理失败时返回原路径
+        """
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return path
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path
+        key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size, provider)
+        with self._lock:
+            processed = self._processed.get(key)
+        if processed and os.path.exists(processed):
+            return processed
+
+        from .upload_manager import file_sha256
+        max_dimension = PROVIDER_MAX_DIMENSIONS.get(provider, DEFAULT_MAX_DIMENSION)
+        source_hash = file_sha256(path)
+        base_name = f"{source_hash[:24]}_{max_dimension}"
+        for ext in (".jpg", ".webp"):
+            cached = os.path.join(self._cache_dir(), base_name + ext)
+            if os.path.exists(cached):
+                return self._remember(key, cached)
+
+        try:
+            with Image.open(path) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+                has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+                if has_alpha:
+                    output_path = os.path.join(self._cache_dir(), base_name + ".webp")
+                    img.convert("RGBA").save(output_path, "WEBP", quality=WEBP_QUALITY, method=4)
+                else:
+                    output_path = os.path.join(self._cache_dir(), base_name + ".jpg")
+                    img.convert("RGB").save(output_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        except Exception as e:
+            print(f"Image preprocessing failed for {path}: {e}")
+            return path
+
+        if os.path.getsize(output_path) >= stat.st_size:
+            os.remove(output_path)
+            return self._remember(key, path)
+        print(f"Preprocessed {path}: {stat.st_size / 1024:.0f} KB -> {os.path.getsize(output_path) / 1024:.0f} KB")
+        return self._remember(key, output_path)
+
+    def _remember(self, key, processed):
+        with self._lock:
+            self._processed[key] = processed
+        return processed
+
+
+_image_preprocessor = None
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    global _image_preprocessor
+    if _image_preprocessor is None:
+        _image_preprocessor = ImagePreprocessor()
+    return _image_preprocessor
@@ -0,0 +1,67 @@
+import os
+import threading
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+
+class DirectoryIndex:
+    """
+    输入目录的图片文件索引
+
+    用 os.scandir 扫描并排序后缓存结果，之后每次只检查已扫描目录的 mtime，
+    目录没有增删文件时直接返回缓存的列表。include_subfolders 为 True 时子目录中的文件以 "子目录/文件名" 列出。
+    """
+
+    def __init__(self, extensions=IMAGE_EXTENSIONS):
+        self._extensions = extensions
+        self._lock = threading.Lock()
+        # (目录, include_subfolders) -> ({目录: mtime_ns}, 文件列表)
+        self._cache = {}
+
+    def list_files(self, root, include_subfolders=False):
+        key = (root, include_subfolders)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and self._unchanged(cached[0]):
+            return cached[1]
+
+        dir_mtimes = {}
+        files = []
+        self._scan(root, "", include_subfolders, dir_mtimes, files)
+        files.sort()
+        with self._lock:
+            self._cache[key] = (dir_mtimes, files)
+        return files
+
+    @staticmethod
+    def _unchanged(dir_mtimes):
+        try:
+            return all(os.stat(path).st_mtime_ns == mtime for path, mtime in dir_mtimes.items())
+        except OSError:
+            return False
+
+    def _scan(self, directory, prefix, include_subfolders, dir_mtimes, files):
+        try:
+            dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    if os.path.splitext(entry.name)[1].lower() in self._extensions:
+                        files.append(prefix + entry.name)
+                elif include_subfolders and entry.is_dir() and not entry.name.startswith("."):
+                    self._scan(entry.path, f"{prefix}{entry.name}/", include_subfolders, dir_mtimes, files)
+            except OSError:
+                continue
+
+
+_input_index = None
+
+
+def get_input_index() -> DirectoryIndex:
+    global _input_index
+    if _input_index is None:
+        _input_index = DirectoryIndex()
+    return _input_index
@@ -0,0 +1,150 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from .utils import get_comfyonline_config
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+DEFAULT_JSONL_PATH = "metrics.jsonl"
+# JSONL 文件超过该大小时轮转为 .1
+DEFAULT_JSONL_MAX_MB = 50
+
+METRICS_ROUTE = "/hflow/metrics"
+
+
+class Metrics:
+    """
+    云端任务各阶段的耗时和计数
+
+    阶段（span）:
+        encode      本地图片编码/上传（provider 字段记录服务名）
+        create      创建任务请求（含限流排队和重试）
+        queued      任务创建到第一次查询到 RUNNING
+        generation  RUNNING 到 COMPLETED/FAILED（没有观察到 RUNNING 时从创建开始计算）
+        first_token LLMTask 流式模式下第一次收到部分结果的耗时
+        download    下载全部输出，附带字节数
+        total       节点执行的总耗时
+
+    计数: polls（查询次数）、retries（重试次数）、errors（创建失败、查询失败、任务失败、超时、下载失败）
+
+    每个阶段结束时写一行 JSON 到 metrics.jsonl，除 encode 外都带有 task_id，可以按任务关联各阶段；
+    累计值可以通过 /hflow/metrics 以 Prometheus 文本格式读取。
+    """
+
+    def __init__(self, jsonl_path=None, jsonl_max_bytes=DEFAULT_JSONL_MAX_MB * 1024 * 1024):
+        self._jsonl_path = jsonl_path
+        self._jsonl_max_bytes = jsonl_max_bytes
+        self._lock = threading.Lock()
+        # (name, node) -> 计数
+        self._counters = defaultdict(float)
+        # (span, node) -> [次数, 总秒数]
+        self._spans = defaultdict(lambda: [0, 0.0])
+
+    def inc(self, name, node, value=1):
+        with self._lock:
+            self._counters[(name, node or "unknown")] += value
+
+    def observe(self, span, node, seconds, **fields):
+        """记录一个阶段的耗时，fields 会原样写入 JSONL（例如 task_id、bytes）"""
+        node = node or "unknown"
+        with self._lock:
+            summary = self._spans[(span, node)]
+            summary[0] += 1
+            summary[1] += seconds
+            if span == "download" and fields.get("bytes"):
+                self._counters[("download_bytes", node)] += fields["bytes"]
+        if self._jsonl_path:
+            record = {"ts": round(time.time(), 3), "span": span, "node": node, "seconds": round(seconds, 4)}
+            record.update(fields)
+            self._write(record)
+
+    @contextlib.contextmanager
+    def span(self, span, node, **fields):
+        """记录 with 块的耗时，块内抛出异常时同样记录并标记 error"""
+        start = time.monotonic()
+        try:
+            yield fields
+        except BaseException:
+            fields["error"] = True
+            raise
+        finally:
+            self.observe(span, node, time.monotonic() - start, **fields)
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if os.path.exists(self._jsonl_path) and os.path.getsize(self._jsonl_path) > self._jsonl_max_bytes:
+                    os.replace(self._jsonl_path, self._jsonl_path + ".1")
+                with open(self._jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"Failed to write metrics: {e}")
+
+    def prometheus_text(self, queue_depths=None):
+        """
+        Prometheus 文本格式
+
+        参数:
+            queue_depths (dict): RateLimiter.queue_depths() 的结果，输出为各接口排队和进行中的请求数
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            spans = {key: list(value) for key, value in self._spans.items()}
+
+        lines = ["# TYPE hflow_span_seconds summary"]
+        for (span, node), (count, total) in sorted(spans.items()):
+            labels = f'span="{span}",node="{_escape(node)}"'
+            lines.append(f"hflow_span_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"hflow_span_seconds_count{{{labels}}} {count}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE hflow_{name}_total counter")
+            for (counter_name, node), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f'hflow_{name}_total{{node="{_escape(node)}"}} {value:g}')
+
+        for field in ("queued", "in_flight"):
+            lines.append(f"# TYPE hflow_rate_limit_{field} gauge")
+            for key, depth in sorted((queue_depths or {}).items()):
+                lines.append(f'hflow_rate_limit_{field}{{endpoint="{_escape(key)}"}} {depth[field]}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def _queue_depths():
+    from .rate_limiter import get_rate_limiter
+    return get_rate_limiter().queue_depths()
+
+
+async def handle_metrics(request):
+    import asyncio
+    from aiohttp import web
+    from .task_client import get_task_client
+    # 限流器只在客户端事件循环中访问
+    client = get_task_client()
+    queue_depths = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_queue_depths(), client.loop))
+    return web.Response(text=get_metrics().prometheus_text(queue_depths), content_type="text/plain",
+                        charset="utf-8")
+
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            config = get_comfyonline_config()
+            jsonl_path = config.get("metrics", "jsonl_path", fallback=DEFAULT_JSONL_PATH).strip()
+            _metrics = Metrics(
+                jsonl_path=os.path.join(PACKAGE_DIR, jsonl_path) if jsonl_path else None,
+                jsonl_max_bytes=config.getint("metrics", "jsonl_max_mb", fallback=DEFAULT_JSONL_MAX_MB) * 1024 * 1024)
+    return _metrics
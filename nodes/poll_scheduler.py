@@ -0,0 +1,272 @@
+import asyncio
+
+from .metrics import get_metrics
+from .polling_policy import get_polling_policy
+from .retry import backoff_delay, classify_error
+
+# 每轮最多查询的任务数，超出的任务顺延到下一轮
+DEFAULT_MAX_QUERIES_PER_TICK = 20
+# 同时进行的查询请求数
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TICK_INTERVAL = 1.0
+# 连续多少次可重试的查询错误后放弃该任务
+MAX_CONSECUTIVE_ERRORS = 5
+# 等待 webhook 回调的任务只按该间隔兜底轮询
+WEBHOOK_FALLBACK_INTERVAL = 60
+# 单次状态查询的超时（秒）
+QUERY_TIMEOUT = 15
+# 任务开始等待之前收到的回调保留的时间（秒）和条数
+EARLY_NOTIFICATION_TTL = 300
+MAX_EARLY_NOTIFICATIONS = 1000
+
+
+class _WatchedTask:
+    def __init__(self, task_id, future, polling_interval, tag, policy_key, started_at, webhook, on_update,
+                 node_class):
+        self.task_id = task_id
+        self.future = future
+        self.polling_interval = polling_interval
+        self.tag = tag
+        self.errors = 0
+        self.policy_key = policy_key
+        self.started_at = started_at
+        self.next_poll_at = started_at
+        self.attempt = 0
+        self.status = None
+        self.webhook = webhook
+        self.on_update = on_update
+        self.node_class = node_class
+        # 第一次查询到 RUNNING 的时间，用于区分排队和生成耗时
+        self.running_at = None
+        # 是否有正在进行的查询，避免同一任务的查询重叠
+        self.in_flight = False
+
+
+class PollScheduler:
+    """
+    集中式任务状态轮询
+
+    所有等待中的 task_id 由同一个调度协程按轮次查询：如果配置了批量查询接口，
+    每轮只发一次请求；否则在并发数和每轮查询数的限制下逐个查询。
+    任务进入 COMPLETED/FAILED 时通过 future 唤醒等待方。
+
+    带 policy_key 的任务由 PollingPolicy 决定下一次查询时间，否则使用固定间隔。
+    每个任务每轮只查询一次，查询出错时不在本轮内重试，而是按 Retry-After 或退避时间推迟该任务的下一次查询。
+    每个查询在独立的协程中进行，调度循环不等待查询完成，一个慢查询或异常的响应不会阻塞其他任务的轮询。
+    等待 webhook 的任务由 notify() 唤醒，轮询只作为兜底，间隔不少于 WEBHOOK_FALLBACK_INTERVAL。
+    """
+
+    def __init__(self, client, tick_interval=DEFAULT_TICK_INTERVAL, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_queries_per_tick=DEFAULT_MAX_QUERIES_PER_TICK, batch_query_url=None):
+        self._client = client
+        self._tick_interval = tick_interval
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_queries_per_tick = max_queries_per_tick
+        self._batch_query_url = batch_query_url
+        self._watched = {}
+        self._runner = None
+        # 正在进行的查询协程，保持引用避免被回收
+        self._queries = set()
+        # 还没有开始等待的任务收到的回调：task_id -> (收到的时间, 任务详情)
+        self._early_notifications = {}
+        self._policy = get_polling_policy()
+
+    @property
+    def pending_count(self):
+        return len(self._watched)
+
+    def watch(self, task_id, polling_interval, tag="Task", policy_key=None, elapsed=0,
+              webhook=False, on_update=None, node_class=None) -> asyncio.Future:
+        """
+        登记一个等待中的任务，返回在任务结束时完成的 future
+
+        参数:
+            elapsed (float): 任务已运行的秒数，从任务日志恢复的任务不为 0
+            webhook (bool): 任务创建时带了本进程的回调地址
+            on_update (callable): 每次查询到未结束的任务详情时调用，用于读取部分结果
+            node_class (str): 指标中使用的节点类名
+        """
+        loop = asyncio.get_running_loop()
+        watched = self._watched.get(task_id)
+        if watched is None:
+            watched = _WatchedTask(task_id, loop.create_future(), polling_interval, tag, policy_key,
+                                   started_at=loop.time() - elapsed, webhook=webhook, on_update=on_update,
+                                   node_class=node_class)
+            watched.next_poll_at = loop.time()
+            if webhook:
+                watched.next_poll_at += WEBHOOK_FALLBACK_INTERVAL
+            elif policy_key:
+                watched.next_poll_at += self._policy.next_interval(policy_key, elapsed, 0)
+            self._watched[task_id] = watched
+            # 创建任务和开始等待之间收到的回调（例如 LLMTask 分两次调用 submit_task 和 wait_for_task）
+            early = self._early_notifications.pop(task_id, None)
+            if early is not None and loop.time() - early[0] <= EARLY_NOTIFICATION_TTL:
+                self.notify(task_id, early[1])
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+        return watched.future
+
+    async def stop(self):
+        """停止轮询循环（进程退出时调用），正在等待的任务不会再被查询"""
+        tasks = list(self._queries)
+        if self._runner is not None and not self._runner.done():
+            tasks.append(self._runner)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def unwatch(self, task_id):
+        watched = self._watched.pop(task_id, None)
+        if watched is not None and not watched.future.done():
+            watched.future.cancel()
+
+    def resolve(self, task_id, query_data):
+        """收到任务详情（轮询或外部通知）时更新状态，结束时唤醒等待方"""
+        watched = self._watched.get(task_id)
+        if watched is None:
+            return
+        status = query_data.get('status')
+        if status != watched.status:
+            watched.status = status
+            print(f"{watched.tag} task status: {status}")
+        now = asyncio.get_running_loop().time()
+        if status == "RUNNING" and watched.running_at is None:
+            watched.running_at = now
+            get_metrics().observe("queued", watched.node_class, now - watched.started_at, task_id=task_id)
+        if status not in ("COMPLETED", "FAILED"):
+            if watched.on_update is not None:
+                try:
+                    watched.on_update(query_data)
+                except Exception as e:
+                    print(f"Exception in {watched.tag} update callback: {e}")
+            return
+        self._watched.pop(task_id, None)
+        get_metrics().observe("generation", watched.node_class, now - (watched.running_at or watched.started_at),
+                              task_id=task_id, status=status, polls=watched.attempt)
+        if status == "COMPLETED":
+            self._policy.record(watched.policy_key, now - watched.started_at)
+        if not watched.future.done():
+            watched.future.set_result(query_data)
+
+    def notify(self, task_id, query_data):
+        """
+        收到 webhook 回调：带有最终结果时直接唤醒等待方，否则立即查询一次任务详情
+
+        任务还没有开始等待时先保留回调，在 watch() 中使用
+        """
+        watched = self._watched.get(task_id)
+        if watched is None:
+            self._buffer_notification(task_id, query_data)
+            return
+        status = query_data.get('status')
+        if status == "FAILED" or (status == "COMPLETED" and
+                                  (query_data.get('output') or query_data.get('llm_output'))):
+            self.resolve(task_id, query_data)
+        else:
+            watched.next_poll_at = asyncio.get_running_loop().time()
+
+    def _buffer_notification(self, task_id, query_data):
+        now = asyncio.get_running_loop().time()
+        notifications = self._early_notifications
+        # 按收到的顺序保存，先清理过期的和超出条数的
+        for key in list(notifications):
+            if now - notifications[key][0] <= EARLY_NOTIFICATION_TTL and len(notifications) < MAX_EARLY_NOTIFICATIONS:
+                break
+            del notifications[key]
+        notifications.pop(task_id, None)
+        notifications[task_id] = (now, query_data)
+
+    def _on_error(self, watched, error):
+        """可重试的错误（5xx/超时等）推迟下一次查询后继续轮询，连续出错过多或不可重试的错误（4xx）结束等待"""
+        retryable, retry_after = classify_error(error)
+        watched.errors += 1
+        get_metrics().inc("errors", watched.node_class)
+        if retryable and watched.errors < MAX_CONSECUTIVE_ERRORS:
+            delay = backoff_delay(watched.errors - 1, retry_after)
+            watched.next_poll_at = max(watched.next_poll_at, asyncio.get_running_loop().time() + delay)
+            print(f"Exception when polling task status ({watched.errors}/{MAX_CONSECUTIVE_ERRORS}), "
+                  f"retrying in {delay:.1f}s: {error}")
+        else:
+            self._fail(watched, error)
+
+    def _fail(self, watched, error):
+        self._watched.pop(watched.task_id, None)
+        if not watched.future.done():
+            watched.future.set_exception(error)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._watched:
+            try:
+                self._sweep(loop)
+            except Exception as e:
+                # 单个任务的异常不能让调度循环退出，否则其他任务都要等到超时
+                print(f"Exception in poll scheduler: {e}")
+            await asyncio.sleep(self._tick_interval)
+
+    def _sweep(self, loop):
+        """启动本轮到期任务的查询，不等待查询完成"""
+        now = loop.time()
+        due = sorted((w for w in self._watched.values() if not w.in_flight and w.next_poll_at <= now),
+                     key=lambda w: w.next_poll_at)[:self._max_queries_per_tick]
+        if not due:
+            return
+        for watched in due:
+            watched.attempt += 1
+            watched.in_flight = True
+            get_metrics().inc("polls", watched.node_class)
+            watched.next_poll_at = now + self._next_interval(watched, now)
+        if self._batch_query_url:
+            self._start_query(self._query_batch(due))
+        else:
+            for watched in due:
+                self._start_query(self._query_one(watched))
+
+    def _start_query(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._queries.add(task)
+        task.add_done_callback(self._queries.discard)
+
+    def _next_interval(self, watched, now):
+        if watched.webhook:
+            return WEBHOOK_FALLBACK_INTERVAL
+        if not watched.policy_key:
+            return watched.polling_interval
+        return self._policy.next_interval(watched.policy_key, now - watched.started_at, watched.attempt)
+
+    async def _query_one(self, watched):
+        try:
+            async with self._semaphore:
+                query_data = await self._client.query_task(watched.task_id)
+            if not isinstance(query_data, dict) or not query_data.get('status'):
+                raise Exception(f"Invalid task detail for {watched.task_id}: {query_data!r}")
+            watched.errors = 0
+            self.resolve(watched.task_id, query_data)
+        except Exception as e:
+            self._on_error(watched, e)
+        finally:
+            watched.in_flight = False
+
+    async def _query_batch(self, due):
+        try:
+            data = await self._client.post_json(self._batch_query_url, {"task_ids": [w.task_id for w in due]},
+                                                timeout=QUERY_TIMEOUT)
+            items = data.get('data') if isinstance(data, dict) else None
+            if not isinstance(items, list):
+                raise Exception(f"Invalid batch query response: {data!r}")
+        except Exception as e:
+            for watched in due:
+                watched.in_flight = False
+                self._on_error(watched, e)
+            return
+        for watched in due:
+            watched.errors = 0
+            watched.in_flight = False
+        for query_data in items:
+            if isinstance(query_data, dict) and query_data.get('task_id') and query_data.get('status'):
+                try:
+                    self.resolve(query_data['task_id'], query_data)
+                except Exception as e:
+                    watched = self._watched.get(query_data['task_id'])
+                    if watched is not None:
+                        self._on_error(watched, e)
@@ -0,0 +1,107 @@
+import json
+import os
+import random
+import threading
+
+STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "polling_stats.json")
+
+MIN_INTERVAL = 2.0
+MAX_INTERVAL = 30.0
+JITTER = 0.2
+# 新样本在平均耗时中的权重
+EWMA_ALPHA = 0.3
+
+
+def policy_key(node_class: str, **params) -> str:
+    """按节点类型和影响耗时的参数生成统计 key，例如 KlingImageToVideo:duration=10,is_pro=True"""
+    if not params:
+        return node_class
+    return node_class + ":" + ",".join(f"{k}={params[k]}" for k in sorted(params))
+
+
+class PollingPolicy:
+    """
+    自适应轮询间隔
+
+    按 policy_key 记录历史完成耗时（指数加权平均），在预计完成时间附近密集轮询，
+    其他时候按指数退避并加入随机抖动。统计数据保存在本地 polling_stats.json。
+    """
+
+    def __init__(self, stats_path=STATS_PATH, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self._stats_path = stats_path
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._lock = threading.Lock()
+        self._stats = self._load()
+
+    def _load(self):
+        try:
+            with open(self._stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = self._stats_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._stats_path)
+        except OSError as e:
+            print(f"Failed to save polling stats: {e}")
+
+    def expected_duration(self, key):
+        stats = self._stats.get(key)
+        return stats["mean"] if stats else None
+
+    def next_interval(self, key, elapsed, attempt):
+        """
+        计算下一次轮询前的等待秒数
+
+        参数:
+            key (str): policy_key
+            elapsed (float): 任务已运行的秒数
+            attempt (int): 已轮询次数
+        """
+        expected = self.expected_duration(key) if key else None
+        if expected is None:
+            # 没有历史数据：从最小间隔开始指数退避
+            interval = self._min_interval * (1.5 ** attempt)
+        else:
+            window = max(self._min_interval, expected * 0.1)
+            remaining = expected - elapsed
+            if remaining > window:
+                # 离预计完成还早，直接睡到窗口开始
+                interval = remaining - window
+            elif remaining > -window:
+                # 预计完成时间附近，密集轮询
+                interval = self._min_interval
+            else:
+                # 已超出预期，按超出时长退避
+                interval = self._min_interval * (1.5 ** ((-remaining - window) / window))
+        interval = min(max(interval, self._min_interval), self._max_interval)
+        return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def record(self, key, duration):
+        """记录一次完成耗时"""
+        if not key:
+            return
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = {"count": 0, "mean": duration}
+            else:
+                stats["mean"] = (1 - EWMA_ALPHA) * stats["mean"] + EWMA_ALPHA * duration
+            stats["count"] += 1
+            self._stats[key] = stats
+            self._save()
+
+
+_polling_policy = None
+
+
+def get_polling_policy() -> PollingPolicy:
+    global _polling_policy
+    if _polling_policy is None:
+        _polling_policy = PollingPolicy()
+    return _polling_policy
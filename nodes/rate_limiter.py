@@ -0,0 +1,133 @@
+import asyncio
+import collections
+import contextlib
+import time
+
+from .utils import get_comfyonline_config
+
+# 未配置的接口使用的默认值：每秒请求数, 最大并发数
+DEFAULT_LIMIT = (5.0, 20)
+
+
+class EndpointLimiter:
+    """
+    单个接口的令牌桶 + 最大并发限制
+
+    超出限制的请求按到达顺序排队等待，而不是直接失败。
+    """
+
+    def __init__(self, rate, max_in_flight):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters = collections.deque()
+        self._timer = None
+
+    @property
+    def queue_depth(self):
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已经拿到名额但调用方被取消，归还名额
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wake(self):
+        self._refill()
+        while self._waiters and self.in_flight < self.max_in_flight and self._tokens >= 1:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._tokens -= 1
+            self.in_flight += 1
+            waiter.set_result(None)
+
+        # 还有排队的请求但令牌不足时，等令牌补充后再唤醒
+        if self._waiters and self.in_flight < self.max_in_flight and self._timer is None:
+            delay = (1 - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._wake()
+
+
+class RateLimiter:
+    """
+    进程内按接口划分的限流器
+
+    限制在 config.ini 的 [rate_limits] 中配置，格式为 "每秒请求数, 最大并发数"，
+    key 为接口名（如 create_kling_image2video_task），可以带子类型（如 create_kling_image2video_task.pro）；
+    子类型未配置时使用接口的配置，接口也未配置时使用 default。
+    """
+
+    def __init__(self):
+        self._limiters = {}
+
+    def _load_limit(self, key):
+        config = get_comfyonline_config()
+        base = key.split(".", 1)[0]
+        for name in (key, base, "default"):
+            value = config.get("rate_limits", name, fallback=None)
+            if value:
+                try:
+                    rate, max_in_flight = value.split(",")
+                    rate, max_in_flight = float(rate), int(max_in_flight)
+                except ValueError:
+                    rate, max_in_flight = 0, 0
+                if rate > 0 and max_in_flight > 0:
+                    return rate, max_in_flight
+                print(f"Invalid rate limit {name} = {value!r} in config.ini, expected \"<requests per second>, <max in flight>\" "
+                      f"greater than 0; using {DEFAULT_LIMIT[0]}, {DEFAULT_LIMIT[1]}")
+                return DEFAULT_LIMIT
+        return DEFAULT_LIMIT
+
+    def get(self, key) -> EndpointLimiter:
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = EndpointLimiter(*self._load_limit(key))
+            self._limiters[key] = limiter
+        return limiter
+
+    @contextlib.asynccontextmanager
+    async def limit(self, key):
+        limiter = self.get(key)
+        await limiter.acquire()
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def queue_depths(self):
+        """各接口当前排队和进行中的请求数"""
+        return {key: {"queued": limiter.queue_depth, "in_flight": limiter.in_flight}
+                for key, limiter in self._limiters.items()}
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .utils import get_comfyonline_config
+
+CACHE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+RESULT_CACHE_PATH = os.path.join(CACHE_DIR, "result_cache.db")
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.db")
+UPLOAD_CACHE_PATH = os.path.join(CACHE_DIR, "upload_cache.db")
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+# 结果确定（带 seed）的节点默认启用缓存，其他节点可以在 config.ini 的 [result_cache] enabled_nodes 中开启
+DEFAULT_CACHED_NODES = ("FluxProUltra", "HiDreamI1")
+
+DEFAULT_LLM_MAX_ENTRIES = 10000
+DEFAULT_LLM_MAX_MB = 100
+DEFAULT_LLM_TTL_HOURS = 168
+
+DEFAULT_UPLOAD_MAX_ENTRIES = 10000
+DEFAULT_UPLOAD_TTL_HOURS = 24
+
+
+class ResultCache:
+    """
+    按请求哈希索引的结果缓存
+
+    每条记录保存一个 JSON 值和它占用的字节数，按最近使用时间淘汰，超过条数、总字节数或有效期的记录会被删除。
+    淘汰只删除索引记录，不会删除输出目录中的文件。
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE_DAYS * 24 * 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """返回缓存的值，不存在或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, size=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), size, now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.max_age:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.max_age,))
+        count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+        # 从最久未使用的记录开始删除，直到满足限制
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used_at ASC").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            count -= 1
+            total_size -= size
+
+    def stats(self):
+        with self._lock:
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": total_size, "hits": self.hits, "misses": self.misses}
+
+
+def result_cache_enabled(node_class: str) -> bool:
+    """节点是否使用结果缓存"""
+    if node_class in DEFAULT_CACHED_NODES:
+        return True
+    config = get_comfyonline_config()
+    enabled_nodes = config.get("result_cache", "enabled_nodes", fallback="")
+    return node_class in [name.strip() for name in enabled_nodes.split(",")]
+
+
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        config = get_comfyonline_config()
+        _result_cache = ResultCache(
+            max_entries=config.getint("result_cache", "max_entries", fallback=DEFAULT_MAX_ENTRIES),
+            max_bytes=config.getint("result_cache", "max_mb", fallback=DEFAULT_MAX_BYTES // 1024 // 1024) * 1024 * 1024,
+            max_age=config.getfloat("result_cache", "max_age_days", fallback=DEFAULT_MAX_AGE_DAYS) * 24 * 3600)
+    return _result_cache
+
+
+def llm_cache_enabled() -> bool:
+    return get_comfyonline_config().getboolean("llm_cache", "enabled", fallback=True)
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> ResultCache:
+    """LLMTask 的响应缓存，与结果缓存分开存放在 llm_cache.db"""
+    global _llm_cache
+    if _llm_cache is None:
+        config = get_comfyonline_config()
+        _llm_cache = ResultCache(
+            path=LLM_CACHE_PATH,
+            max_entries=config.getint("llm_cache", "max_entries", fallback=DEFAULT_LLM_MAX_ENTRIES),
+            max_bytes=config.getint("llm_cache", "max_mb", fallback=DEFAULT_LLM_MAX_MB) * 1024 * 1024,
+            max_age=config.getfloat("llm_cache", "ttl_hours", fallback=DEFAULT_LLM_TTL_HOURS) * 3600)
+    return _llm_cache
+
+
+_upload_cache = None
+
+
+def get_upload_cache() -> ResultCache:
+    """本地文件内容哈希到上传地址的映射，保存在 upload_cache.db"""
+    global _upload_cache
+    if _upload_cache is None:
+        config = get_comfyonline_config()
+        _upload_cache = ResultCache(
+            path=UPLOAD_CACHE_PATH,
+            max_entries=DEFAULT_UPLOAD_MAX_ENTRIES,
+            max_age=config.getfloat("comfyonline", "upload_url_ttl_hours", fallback=DEFAULT_UPLOAD_TTL_HOURS) * 3600)
+    return _upload_cache
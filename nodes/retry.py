@@ -0,0 +1,74 @@
+import asyncio
+import email.utils
+import random
+import time
+
+import aiohttp
+
+DEFAULT_MAX_ATTEMPTS = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# Retry-After 超过该值时按该值等待
+MAX_RETRY_AFTER = 120.0
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """解析 Retry-After（秒数或 HTTP 日期），返回秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error):
+    """
+    判断错误是否可以重试
+
+    返回:
+        tuple: (是否可重试, 服务端要求的等待秒数或 None)
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        if error.status in RETRYABLE_STATUS:
+            retry_after = parse_retry_after(error.headers.get('Retry-After')) if error.headers else None
+            return True, retry_after
+        return False, None
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_AFTER)
+    return min(MAX_DELAY, BASE_DELAY * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+async def with_retries(func, description="request", max_attempts=DEFAULT_MAX_ATTEMPTS, metric_label=None):
+    """
+    执行 func()，遇到可重试的错误（429/5xx/超时/连接错误）时指数退避后重试，其他错误直接抛出
+
+    参数:
+        func: 每次调用返回一个新协程的函数
+        description (str): 日志中显示的请求描述
+        metric_label (str): 重试计数的节点类名
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await func()
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            if not retryable or attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt, retry_after)
+            from .metrics import get_metrics
+            get_metrics().inc("retries", metric_label)
+            print(f"{description} failed ({e}), retrying in {delay:.1f}s ({attempt + 1}/{max_attempts - 1})")
+            await asyncio.sleep(delay)
@@ -0,0 +1,106 @@
+import base64
+import json
+import mmap
+import os
+import re
+import uuid
+
+# 每次编码的原始字节数，必须是 3 的倍数，保证分块编码结果可以直接拼接
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+
+class LocalFileRef:
+    """
+    请求体中的本地文件引用，发送时以 base64 字符串的形式流式写入 JSON
+
+    文件内容不会整体读入内存，内存占用与文件大小无关。
+    """
+
+    def __init__(self, path):
+        self.path = os.path.realpath(path)
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+    @property
+    def encoded_size(self):
+        return 4 * ((self.size + 2) // 3)
+
+    def cache_key(self):
+        """用于 payload_hash 的稳定标识"""
+        return f"file:{self.path}:{self.mtime_ns}:{self.size}"
+
+    def iter_base64(self, chunk_size=ENCODE_CHUNK_SIZE):
+        """通过 mmap 分块读取文件并逐块 base64 编码"""
+        if self.size == 0:
+            return
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), chunk_size):
+                    yield base64.b64encode(mm[offset:offset + chunk_size])
+
+    def __repr__(self):
+        return f"LocalFileRef({self.path!r}, {self.size} bytes)"
+
+
+def has_file_refs(value):
+    if isinstance(value, LocalFileRef):
+        return True
+    if isinstance(value, dict):
+        return any(has_file_refs(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_file_refs(v) for v in value)
+    return False
+
+
+class StreamingJSONBody:
+    """
+    把包含 LocalFileRef 的 payload 序列化为可流式发送的 JSON 请求体
+
+    普通字段照常用 json 序列化，文件字段在发送时边读边编码，并预先计算出准确的 Content-Length。
+    """
+
+    def __init__(self, payload):
+        token = uuid.uuid4().hex
+        refs = []
+
+        def default(o):
+            if isinstance(o, LocalFileRef):
+                refs.append(o)
+                return f"{token}:{len(refs) - 1}"
+            raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+        text = json.dumps(payload, default=default)
+        # 按占位符切分，得到 [json片段, 文件, json片段, 文件, ..., json片段]
+        pieces = re.split(f'"{token}:(\\d+)"', text)
+        self._parts = []
+        for i, piece in enumerate(pieces):
+            if i % 2 == 0:
+                self._parts.append(piece.encode('utf-8'))
+            else:
+                self._parts.append(refs[int(piece)])
+
+    @property
+    def content_length(self):
+        length = 0
+        for part in self._parts:
+            if isinstance(part, LocalFileRef):
+                length += part.encoded_size + 2
+            else:
+                length += len(part)
+        return length
+
+    async def iter_chunks(self):
+        for part in self._parts:
+            if isinstance(part, LocalFileRef):
+                yield b'"'
+                for chunk in part.iter_base64():
+                    yield chunk
+                yield b'"'
+            elif part:
+                yield part
+
+
+def json_body_size(payload):
+    """计算 payload 序列化后的字节数，不会把文件内容读入内存"""
+    return StreamingJSONBody(payload).content_length
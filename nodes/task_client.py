@@ -0,0 +1,563 @@
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import aiohttp
+import folder_paths
+
+from .utils import (get_comfyonline_api_key, get_comfyonline_config, payload_hash, current_execution,
+                    send_executed)
+from .downloader import RangeDownloader
+from .metrics import get_metrics
+from .poll_scheduler import PollScheduler, QUERY_TIMEOUT
+from .rate_limiter import get_rate_limiter
+from .retry import with_retries
+from .streaming_body import StreamingJSONBody, has_file_refs
+from .result_cache import get_result_cache, result_cache_enabled
+from .task_journal import (get_task_journal, STATUS_PENDING, STATUS_COMPLETED, STATUS_FAILED, STATUS_SAVED,
+                          STATUS_EXPIRED)
+from .webhook import webhook_url
+
+COMFYONLINE_API_BASE = os.getenv("COMFYONLINE_API_BASE", "https://api.comfyonline.app/api").rstrip("/")
+QUERY_TASK_URL = f"{COMFYONLINE_API_BASE}/query_app_general_detail"
+QUERY_RATE_LIMIT_KEY = "query_app_general_detail"
+
+# 默认轮询参数
+DEFAULT_MAX_WAIT_TIME = 3600
+DEFAULT_POLLING_INTERVAL = 10
+DEFAULT_DOWNLOAD_PARALLELISM = 8
+DEFAULT_DOWNLOAD_PER_HOST = 4
+
+# 连接池默认参数，可以在 config.ini 的 [http] 中修改
+DEFAULT_POOL_LIMIT = 100
+DEFAULT_POOL_LIMIT_PER_HOST = 32
+DEFAULT_KEEPALIVE_SECONDS = 60
+DEFAULT_DNS_CACHE_SECONDS = 300
+# 退出时等待连接关闭的最长时间
+CLOSE_TIMEOUT = 5
+# 上传本地文件时按该速率（字节/秒）估算请求体的发送时间，加到读取超时上
+MIN_UPLOAD_BYTES_PER_SECOND = 64 * 1024
+# 流水线模式下保留的节点预览数
+MAX_PIPELINE_PREVIEWS = 64
+
+
+def endpoint_name(url: str) -> str:
+    """接口名，即 URL 路径的最后一段，例如 create_flux_pro_ultra_task"""
+    return urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def api_url(path: str) -> str:
+    """拼接 comfyonline API 地址，例如 api_url("un-api/create_flux_pro_ultra_task")"""
+    return f"{COMFYONLINE_API_BASE}/{path.lstrip('/')}"
+
+
+class TaskFailedError(Exception):
+    """云端任务返回 FAILED 状态"""
+
+    def __init__(self, error_message):
+        super().__init__(f"Task failed: {error_message}")
+        self.error_message = error_message
+
+
+class TaskTimeoutError(Exception):
+    """超过最大等待时间任务仍未结束"""
+
+
+class TaskClient:
+    """
+    comfyonline 异步任务客户端
+
+    在独立线程的事件循环中运行，所有节点共享同一个 aiohttp 连接池，
+    负责任务的创建、轮询和结果下载。同步代码通过 run() 提交协程。
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="H-flow-TaskClient", daemon=True)
+        self._thread.start()
+        self._session = None
+        # 可选的 HTTP/2 客户端（httpx），None 表示尚未创建，False 表示不可用
+        self._http2_client = None
+        self._poll_scheduler = None
+        # 本进程中正在等待的 task_id，避免同时执行的相同请求共用一个任务
+        self._active_tasks = set()
+        # 流水线模式下仍在进行的后台下载，保持引用避免被回收
+        self._background_tasks = set()
+        # 流水线模式下已下载完成的结果：(prompt_id, 节点 id) -> ui
+        self._pipeline_previews = OrderedDict()
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def run(self, coro):
+        """在客户端事件循环中执行协程，阻塞等待并返回结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """在客户端事件循环中调度协程，不等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        进程内共享的 aiohttp 会话
+
+        同一主机的连接保持 keep-alive 复用，TLS 握手每个主机只需要一次；DNS 解析结果缓存 dns_cache_seconds 秒。
+        """
+        if self._session is None or self._session.closed:
+            config = get_comfyonline_config()
+            connector = aiohttp.TCPConnector(
+                limit=config.getint("http", "pool_limit", fallback=DEFAULT_POOL_LIMIT),
+                limit_per_host=config.getint("http", "pool_limit_per_host", fallback=DEFAULT_POOL_LIMIT_PER_HOST),
+                keepalive_timeout=config.getfloat("http", "keepalive_seconds", fallback=DEFAULT_KEEPALIVE_SECONDS),
+                use_dns_cache=True,
+                ttl_dns_cache=config.getint("http", "dns_cache_seconds", fallback=DEFAULT_DNS_CACHE_SECONDS))
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _get_http2_client(self):
+        """
+        config.ini 中开启 http2 且安装了 httpx[http2] 时返回 HTTP/2 客户端，否则返回 None
+
+        只用于 API 的 JSON 请求（创建、查询），同一主机的所有请求复用一个连接；文件上传和下载仍使用 aiohttp 会话。
+        """
+        if self._http2_client is None:
+            self._http2_client = False
+            config = get_comfyonline_config()
+            if config.getboolean("http", "http2", fallback=False):
+                try:
+                    import httpx
+                    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+                except ImportError:
+                    print("HTTP/2 requires httpx[http2], falling back to HTTP/1.1 keep-alive")
+                else:
+                    self._http2_client = httpx.AsyncClient(http2=True, limits=httpx.Limits(
+                        max_connections=config.getint("http", "pool_limit", fallback=DEFAULT_POOL_LIMIT),
+                        keepalive_expiry=config.getfloat("http", "keepalive_seconds",
+                                                         fallback=DEFAULT_KEEPALIVE_SECONDS)))
+        return self._http2_client or None
+
+    async def close(self):
+        """停止轮询并关闭连接池"""
+        if self._poll_scheduler is not None:
+            await self._poll_scheduler.stop()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._http2_client:
+            await self._http2_client.aclose()
+            self._http2_client = None
+
+    def shutdown(self):
+        """进程退出时关闭连接池并停止事件循环"""
+        if not self._loop.is_running():
+            return
+        try:
+            self.submit(self.close()).result(timeout=CLOSE_TIMEOUT)
+        except Exception as e:
+            print(f"Failed to close HTTP session: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _headers(self):
+        api_token = get_comfyonline_api_key()
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {api_token}'
+        }
+
+    async def post_json(self, url, payload, timeout=60, extra_headers=None):
+        headers = self._headers()
+        if extra_headers:
+            headers.update(extra_headers)
+        body = None
+        read_timeout = timeout
+        if has_file_refs(payload):
+            # 包含本地文件时流式编码请求体，避免把整个文件和 base64 结果读入内存
+            body = StreamingJSONBody(payload)
+            headers['Content-Length'] = str(body.content_length)
+            # 发送大文件的耗时取决于上行带宽，读取超时按请求体大小放宽
+            read_timeout = timeout + body.content_length / MIN_UPLOAD_BYTES_PER_SECOND
+
+        http2_client = self._get_http2_client()
+        if http2_client is not None:
+            return await self._post_json_http2(http2_client, url, payload, body, headers, timeout, read_timeout)
+
+        session = await self.get_session()
+        if body is not None:
+            # 不限制总时长，只限制建立连接和等待响应的时间
+            request_kwargs = {"data": body.iter_chunks()}
+            client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=read_timeout)
+        else:
+            request_kwargs = {"json": payload}
+            client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with session.post(url, headers=headers, timeout=client_timeout, **request_kwargs) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    @staticmethod
+    async def _post_json_http2(client, url, payload, body, headers, timeout, read_timeout):
+        """通过 httpx 发送请求，错误转换为 aiohttp 的异常类型，使重试逻辑对两种传输方式一致"""
+        import httpx
+        from multidict import CIMultiDict, CIMultiDictProxy
+        from yarl import URL
+        request_kwargs = {"content": body.iter_chunks()} if body is not None else {"json": payload}
+        # httpx 的超时分别作用于连接、每次读和每次写，没有总时长限制
+        timeout = httpx.Timeout(connect=timeout, read=read_timeout, write=timeout, pool=timeout)
+        try:
+            response = await client.post(url, headers=headers, timeout=timeout, **request_kwargs)
+        except httpx.TimeoutException as e:
+            raise asyncio.TimeoutError(str(e)) from e
+        except httpx.TransportError as e:
+            raise aiohttp.ClientConnectionError(str(e)) from e
+        if response.status_code >= 400:
+            request_info = aiohttp.RequestInfo(URL(url), "POST", CIMultiDictProxy(CIMultiDict(headers)), URL(url))
+            raise aiohttp.ClientResponseError(request_info, (), status=response.status_code,
+                                              message=response.reason_phrase,
+                                              headers=CIMultiDictProxy(CIMultiDict(response.headers.items())))
+        return response.json()
+
+    async def upload_file(self, upload_url, path, timeout=300):
+        """以 multipart 方式上传本地文件，返回托管地址"""
+        session = await self.get_session()
+        headers = {'Authorization': self._headers()['Authorization']}
+        with open(path, 'rb') as f:
+            form = aiohttp.FormData()
+            form.add_field('file', f, filename=os.path.basename(path))
+            async with session.post(upload_url, headers=headers, data=form,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        if not data.get('data') or not data['data'].get('url'):
+            raise Exception(f"Failed to upload file: {json.dumps(data)}")
+        return data['data']['url']
+
+    async def create_task(self, create_task_url, payload, rate_limit_key=None, node_class=None):
+        """
+        创建任务，返回 task_id
+
+        参数:
+            rate_limit_key (str): 限流 key，默认为接口名；可以带子类型区分不同档位，例如 create_kling_image2video_task.pro
+        """
+        rate_limit_key = rate_limit_key or endpoint_name(create_task_url)
+        # 同一次创建的所有重试使用相同的幂等 key，服务端据此避免重复创建（重复计费）
+        idempotency_key = uuid.uuid4().hex
+
+        async def attempt():
+            async with get_rate_limiter().limit(rate_limit_key):
+                return await self.post_json(create_task_url, payload,
+                                            extra_headers={'Idempotency-Key': idempotency_key})
+
+        data = await with_retries(attempt, description=f"Create task {rate_limit_key}", metric_label=node_class)
+        if not data.get('data') or not data['data'].get('task_id'):
+            raise Exception(f"Failed to create task: {json.dumps(data)}")
+        return data['data']['task_id']
+
+    async def submit_task(self, node_class, create_task_url, payload, digest=None, rate_limit_key=None,
+                          webhook=False, max_wait_time=DEFAULT_MAX_WAIT_TIME):
+        """
+        创建任务并写入任务日志；如果日志中有相同请求且可以继续的任务（例如 ComfyUI 重启前提交的），直接复用
+
+        参数:
+            webhook (bool): 接口支持 webhook，配置了 webhook_base_url 时在请求体中带上本进程的回调地址
+            max_wait_time (int): 与 wait_for_task 相同，创建超过该时间仍未完成的任务不再继续
+
+        返回:
+            dict: task_id/status/output_urls/created_at/webhook
+        """
+        journal = get_task_journal()
+        digest = digest or payload_hash(node_class, payload)
+        entry = journal.find_resumable(node_class, digest, max_age=max_wait_time)
+        if entry is not None and entry["task_id"] not in self._active_tasks:
+            print(f"Resuming {node_class} task {entry['task_id']} from journal ({entry['status']})")
+            self._active_tasks.add(entry["task_id"])
+            return dict(entry, webhook=False)
+
+        # 回调地址每次启动都不同，不参与请求哈希
+        callback_url = webhook_url() if webhook else ""
+        if callback_url:
+            payload = dict(payload, webhook=callback_url)
+        with get_metrics().span("create", node_class) as span:
+            try:
+                task_id = await self.create_task(create_task_url, payload, rate_limit_key=rate_limit_key,
+                                                 node_class=node_class)
+            except Exception:
+                get_metrics().inc("errors", node_class)
+                raise
+            span["task_id"] = task_id
+        print(f"{node_class} task created with ID: {task_id}")
+        journal.record_created(task_id, node_class, digest)
+        self._active_tasks.add(task_id)
+        return {"task_id": task_id, "status": STATUS_PENDING, "output_urls": [], "created_at": time.time(),
+                "webhook": bool(callback_url)}
+
+    async def query_task(self, task_id):
+        """查询一次任务详情，不在这里重试：出错时由 PollScheduler 推迟该任务的下一次查询"""
+        async with get_rate_limiter().limit(QUERY_RATE_LIMIT_KEY):
+            data = await self.post_json(QUERY_TASK_URL, {"task_id": task_id}, timeout=QUERY_TIMEOUT)
+        return data.get('data') if isinstance(data, dict) else None
+
+    def get_poll_scheduler(self) -> PollScheduler:
+        if self._poll_scheduler is None:
+            config = get_comfyonline_config()
+            batch_query_url = config.get("comfyonline", "batch_query_url", fallback="") or None
+            self._poll_scheduler = PollScheduler(self, batch_query_url=batch_query_url)
+        return self._poll_scheduler
+
+    async def wait_for_task(self, task_id, max_wait_time=DEFAULT_MAX_WAIT_TIME,
+                            polling_interval=DEFAULT_POLLING_INTERVAL, tag="Task", policy_key=None,
+                            started_at=None, webhook=False, on_update=None, node_class=None):
+        """
+        等待任务直到 COMPLETED，返回任务详情
+
+        轮询统一交给 PollScheduler，多个等待中的任务共享同一轮查询。
+
+        参数:
+            policy_key (str): 自适应轮询的统计 key，为空时使用固定的 polling_interval
+            started_at (float): 任务创建时间戳，用于恢复的任务计算已运行时长
+            webhook (bool): 任务会回调本进程的 webhook 路由，只做兜底轮询
+            on_update (callable): 任务未结束时每次查询结果的回调，在客户端事件循环中调用
+            node_class (str): 指标中使用的节点类名
+        """
+        scheduler = self.get_poll_scheduler()
+        elapsed = time.time() - started_at if started_at else 0
+        future = scheduler.watch(task_id, polling_interval, tag=tag, policy_key=policy_key, elapsed=elapsed,
+                                 webhook=webhook, on_update=on_update, node_class=node_class)
+        journal = get_task_journal()
+        try:
+            query_data = await asyncio.wait_for(asyncio.shield(future), timeout=max(max_wait_time - elapsed, 0))
+        except asyncio.TimeoutError:
+            scheduler.unwatch(task_id)
+            journal.update_status(task_id, STATUS_EXPIRED)
+            get_metrics().inc("errors", node_class)
+            # 如果超过最大等待时间，抛出异常
+            raise TaskTimeoutError(f"Task timed out after {max_wait_time} seconds")
+        except Exception:
+            # 轮询遇到不可重试的错误或连续出错过多，调度器已放弃该任务，之后不再从日志中继续
+            journal.update_status(task_id, STATUS_FAILED)
+            raise
+        finally:
+            self._active_tasks.discard(task_id)
+
+        if query_data.get('status') == "FAILED":
+            journal.update_status(task_id, STATUS_FAILED)
+            get_metrics().inc("errors", node_class)
+            raise TaskFailedError(query_data.get('error_message', 'Unknown error'))
+        output = query_data.get('output') or {}
+        journal.update_status(task_id, STATUS_COMPLETED, output.get('output_url_list'))
+        return query_data
+
+    async def download(self, url, output_path, timeout=10, expected_sha256=None):
+        """下载文件到磁盘，支持断点续传、大文件分段并行下载，完成后原子重命名"""
+        session = await self.get_session()
+        await RangeDownloader(session).download(url, output_path, timeout=timeout, expected_sha256=expected_sha256)
+
+    async def download_many(self, items, timeout=10):
+        """
+        并发下载多个文件
+
+        总并发数和单个域名的并发数由 config.ini 的 [download] parallelism / per_host 控制。
+
+        参数:
+            items (list): [(url, output_path), ...]
+
+        返回:
+            list: 与 items 顺序一致，成功为 None，失败为对应的异常
+        """
+        config = get_comfyonline_config()
+        semaphore = asyncio.Semaphore(config.getint("download", "parallelism", fallback=DEFAULT_DOWNLOAD_PARALLELISM))
+        per_host = config.getint("download", "per_host", fallback=DEFAULT_DOWNLOAD_PER_HOST)
+        host_semaphores = {}
+
+        async def download_one(url, output_path):
+            host_semaphore = host_semaphores.setdefault(urlparse(url).netloc, asyncio.Semaphore(per_host))
+            async with semaphore, host_semaphore:
+                try:
+                    await self.download(url, output_path, timeout=timeout)
+                    return None
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*(download_one(url, output_path) for url, output_path in items))
+
+    @staticmethod
+    def _output_filenames(filename_prefix, extension, count):
+        counter = random.randint(1, 100000)
+        return [f"{filename_prefix}_{counter + i:05}_.{extension}" for i in range(count)]
+
+    async def _download_outputs(self, urls, full_output_folder, files, node_class=None, task_id=None):
+        """并发下载所有输出到输出目录，任一文件失败时抛出异常"""
+        paths = [os.path.join(full_output_folder, file) for file in files]
+        with get_metrics().span("download", node_class, task_id=task_id, files=len(files)) as span:
+            errors = await self.download_many(list(zip(urls, paths)))
+            for error in errors:
+                if error is not None:
+                    get_metrics().inc("errors", node_class)
+                    raise error
+            span["bytes"] = sum(os.path.getsize(path) for path in paths)
+
+    def _run_in_background(self, coro, description):
+        task = self._loop.create_task(coro)
+        self._background_tasks.add(task)
+
+        def on_done(task):
+            self._background_tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Background {description} failed: {task.exception()}")
+
+        task.add_done_callback(on_done)
+        return task
+
+    async def run_media_task(self, node_class, create_task_url, payload, output_dir, filename_prefix, extension,
+                             ui_key, output_type="output", tag="Task", policy_key=None, rate_limit_key=None,
+                             webhook=False):
+        """
+        创建任务、等待完成并把 output_url_list 中的所有结果并发下载到输出目录
+
+        启用结果缓存的节点遇到相同请求时直接返回已下载的文件；文件已被删除时只重新下载，不再创建任务。
+        开启流水线模式（[pipeline] background_downloads）时任务 COMPLETED 后立即返回输出地址，
+        下游节点可以马上提交任务，下载在后台继续，完成后重新向前端发送节点的预览。
+
+        参数:
+            webhook (bool): 接口支持 webhook 回调，见 submit_task
+
+        返回:
+            dict: 节点返回值 {"ui": {ui_key: [...]}, "result": (第一个输出地址, 换行分隔的全部输出地址)}
+        """
+        with get_metrics().span("total", node_class) as span:
+            return await self._run_media_task(node_class, create_task_url, payload, output_dir, filename_prefix,
+                                              extension, ui_key, output_type, tag, policy_key, rate_limit_key,
+                                              webhook, span)
+
+    async def _run_media_task(self, node_class, create_task_url, payload, output_dir, filename_prefix, extension,
+                              ui_key, output_type, tag, policy_key, rate_limit_key, webhook, span):
+        """span 为 total 阶段的字段，得到 task_id 后写入，使同一任务各阶段的记录可以关联"""
+        # 节点在等待期间一直处于执行状态，这里记录的就是调用方节点
+        prompt_id, node_id = current_execution()
+        digest = payload_hash(node_class, payload)
+        cache = get_result_cache() if result_cache_enabled(node_class) else None
+        output_url_list = None
+        if cache is not None:
+            cached = cache.get(digest)
+            if cached is not None:
+                if all(os.path.exists(os.path.join(output_dir, r["subfolder"], r["filename"]))
+                       for r in cached["results"]):
+                    print(f"{tag} result cache hit: {digest}")
+                    span["cache_hit"] = True
+                    output_urls = cached["output_urls"]
+                    return {"ui": {ui_key: cached["results"]}, "result": (output_urls[0], "\n".join(output_urls))}
+                # 本地文件已被删除，复用输出地址重新下载
+                output_url_list = cached["output_urls"]
+
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(
+            filename_prefix, output_dir, 0, 0)
+
+        files = None
+        if output_url_list:
+            try:
+                files = self._output_filenames(filename_prefix, extension, len(output_url_list))
+                await self._download_outputs(output_url_list, full_output_folder, files, node_class)
+            except Exception as e:
+                print(f"Cached output URL is no longer available: {e}")
+                files = None
+
+        save = None
+        while files is None:
+            task = await self.submit_task(node_class, create_task_url, payload, digest=digest,
+                                          rate_limit_key=rate_limit_key, webhook=webhook)
+            task_id = task["task_id"]
+            span["task_id"] = task_id
+            resumed = task["status"] == STATUS_COMPLETED
+            if resumed:
+                self._active_tasks.discard(task_id)
+                output_url_list = task["output_urls"]
+            else:
+                query_data = await self.wait_for_task(task_id, tag=tag, policy_key=policy_key,
+                                                      started_at=task["created_at"], webhook=task["webhook"],
+                                                      node_class=node_class)
+                output = query_data.get('output') or {}
+                output_url_list = output.get('output_url_list', [])
+            if not output_url_list:
+                raise Exception("Task completed but no output URL found")
+
+            files = self._output_filenames(filename_prefix, extension, len(output_url_list))
+            save = self._download_outputs(output_url_list, full_output_folder, files, node_class, task_id)
+            if resumed:
+                # 复用日志中的输出地址，地址失效时放弃该任务并重新创建
+                try:
+                    await save
+                except Exception as e:
+                    print(f"Output URL of {tag} task {task_id} is no longer available: {e}")
+                    get_task_journal().update_status(task_id, STATUS_EXPIRED)
+                    files = None
+                    continue
+                finally:
+                    save = None
+                get_task_journal().update_status(task_id, STATUS_SAVED)
+
+        results = [{
+            "filename": file,
+            "subfolder": subfolder,
+            "type": output_type,
+            "url": url
+        } for file, url in zip(files, output_url_list)]
+        print(results)
+
+        async def finish(background=False):
+            if save is not None:
+                await save
+                get_task_journal().update_status(task_id, STATUS_SAVED)
+            if cache is not None:
+                size = sum(os.path.getsize(os.path.join(full_output_folder, file)) for file in files)
+                cache.put(digest, {"output_urls": output_url_list, "results": results}, size)
+            if background and node_id is not None:
+                # 节点返回时文件还没有下载，前端的预览加载失败后不会重试，下载完成后重新发送一次
+                self._update_preview(prompt_id, node_id, ui_key, results)
+
+        if save is not None and pipeline_enabled():
+            # 下载失败时任务日志保持 COMPLETED，下次执行相同请求时会重新下载
+            self._run_in_background(finish(background=True), f"download of {tag} task {task_id}")
+        else:
+            await finish()
+        return {"ui": {ui_key: results}, "result": (output_url_list[0], "\n".join(output_url_list))}
+
+
+    def _update_preview(self, prompt_id, node_id, ui_key, results):
+        """
+        把后台下载完成的结果发送到节点的预览
+
+        同一节点的多个任务（例如 BatchImageGenerate）的结果累加发送，预览中显示已经下载完成的全部文件。
+        """
+        key = (prompt_id, node_id)
+        output = self._pipeline_previews.pop(key, None) or {}
+        output.setdefault(ui_key, []).extend(results)
+        self._pipeline_previews[key] = output
+        while len(self._pipeline_previews) > MAX_PIPELINE_PREVIEWS:
+            self._pipeline_previews.popitem(last=False)
+        # 发送的是副本，消息在服务端的事件循环中才序列化
+        send_executed(prompt_id, node_id, {key: list(value) for key, value in output.items()})
+
+
+def pipeline_enabled() -> bool:
+    """流水线模式：任务完成后先返回输出地址，结果在后台下载"""
+    return get_comfyonline_config().getboolean("pipeline", "background_downloads", fallback=False)
+
+
+_task_client = None
+_task_client_lock = threading.Lock()
+
+
+def get_task_client() -> TaskClient:
+    """获取进程内共享的 TaskClient"""
+    global _task_client
+    with _task_client_lock:
+        if _task_client is None:
+            _task_client = TaskClient()
+            atexit.register(_task_client.shutdown)
+        return _task_client
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "task_journal.db")
+
+# 已结束的任务保留天数
+RETENTION_SECONDS = 7 * 24 * 3600
+# 已完成但未下载的任务可以复用的时间，超过后输出地址可能已失效
+COMPLETED_MAX_AGE = 24 * 3600
+
+STATUS_PENDING = "PENDING"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+# 超过最大等待时间仍未完成，不再继续等待
+STATUS_EXPIRED = "EXPIRED"
+# 结果已下载到输出目录
+STATUS_SAVED = "SAVED"
+
+
+class TaskJournal:
+    """
+    云端任务日志
+
+    每个创建成功的任务都会写入 SQLite，记录节点类型、请求哈希、task_id、状态和输出地址列表。
+    ComfyUI 重启后再次执行相同的节点时，可以继续等待未完成的任务，而不是重新提交（重复计费）。
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                node_class TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output_urls TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_payload ON tasks (node_class, payload_hash)")
+        # LLM 任务完成后停留在 COMPLETED，也需要清理
+        self._conn.execute("DELETE FROM tasks WHERE status IN (?, ?, ?, ?) AND updated_at < ?",
+                           (STATUS_COMPLETED, STATUS_SAVED, STATUS_FAILED, STATUS_EXPIRED,
+                            time.time() - RETENTION_SECONDS))
+        self._conn.commit()
+
+    def record_created(self, task_id, node_class, payload_hash):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, node_class, payload_hash, status, output_urls, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                (task_id, node_class, payload_hash, STATUS_PENDING, now, now))
+            self._conn.commit()
+
+    def update_status(self, task_id, status, output_urls=None):
+        encoded = json.dumps(output_urls) if output_urls else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, output_urls = COALESCE(?, output_urls), updated_at = ? WHERE task_id = ?",
+                (status, encoded, time.time(), task_id))
+            self._conn.commit()
+
+    def find_resumable(self, node_class, payload_hash, max_age=None, completed_max_age=COMPLETED_MAX_AGE):
+        """
+        查找可以继续的任务：仍在进行中，或已完成但结果还没下载
+
+        参数:
+            max_age (float): 进行中的任务创建超过该秒数（即超过最大等待时间）时不再继续，并标记为 EXPIRED
+            completed_max_age (float): 已完成的任务超过该秒数未下载时不再复用输出地址，并标记为 EXPIRED
+
+        返回:
+            Optional[dict]: task_id/status/output_urls/created_at，没有时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            if max_age is not None:
+                self._conn.execute(
+                    "UPDATE tasks SET status = ?, updated_at = ? "
+                    "WHERE node_class = ? AND payload_hash = ? AND status = ? AND created_at < ?",
+                    (STATUS_EXPIRED, now, node_class, payload_hash, STATUS_PENDING, now - max_age))
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? "
+                "WHERE node_class = ? AND payload_hash = ? AND status = ? AND updated_at < ?",
+                (STATUS_EXPIRED, now, node_class, payload_hash, STATUS_COMPLETED, now - completed_max_age))
+            self._conn.commit()
+            row = self._conn.execute(
+                "SELECT task_id, status, output_urls, created_at FROM tasks "
+                "WHERE node_class = ? AND payload_hash = ? "
+                "AND (status = ? OR (status = ? AND output_urls IS NOT NULL)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (node_class, payload_hash, STATUS_PENDING, STATUS_COMPLETED)).fetchone()
+        if row is None:
+            return None
+        output_urls = json.loads(row[2]) if row[2] else []
+        return {"task_id": row[0], "status": row[1], "output_urls": output_urls, "created_at": row[3]}
+
+
+_task_journal = None
+
+
+def get_task_journal() -> TaskJournal:
+    global _task_journal
+    if _task_journal is None:
+        _task_journal = TaskJournal()
+    return _task_journal
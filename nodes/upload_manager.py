@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from .utils import get_comfyonline_config, path_to_base64
+from .streaming_body import LocalFileRef
+
+# 内存中缓存的 base64 字符串总大小上限
+DEFAULT_MAX_CACHED_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# 超过该大小的文件不再整体编码，而是在发送请求时流式编码
+STREAMING_THRESHOLD = 8 * 1024 * 1024
+
+
+def file_sha256(path):
+    m = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+class UploadManager:
+    """
+    本地图片只上传/编码一次
+
+    如果 config.ini 配置了 upload_url，本地文件按内容哈希上传一次，之后的节点直接复用返回的地址，
+    地址保存在 upload_cache.db 中，重启后请求体不变，任务日志和结果缓存依然可以命中；
+    否则按 (路径, mtime, 大小) 缓存 base64 字符串，同一个文件在一次运行中只读取和编码一次；
+    大文件返回 LocalFileRef，由 TaskClient 在发送请求时流式编码。
+    """
+
+    def __init__(self, max_cached_bytes=DEFAULT_MAX_CACHED_BYTES):
+        self._max_cached_bytes = max_cached_bytes
+        self._lock = threading.Lock()
+        # (路径, mtime_ns, 大小) -> base64 字符串
+        self._encoded = OrderedDict()
+        self._encoded_bytes = 0
+
+    @staticmethod
+    def _file_key(path):
+        stat = os.stat(path)
+        return (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+
+    def get_handle(self, path, encoding='utf-8'):
+        """
+        返回本地文件的上传地址或 base64 编码
+
+        返回:
+            Union[str, LocalFileRef, None]: 失败时返回 None
+        """
+        try:
+            key = self._file_key(path)
+        except OSError as e:
+            print(f"错误: 无法读取文件 '{path}': {e}")
+            return None
+
+        upload_url = get_comfyonline_config().get("comfyonline", "upload_url", fallback="")
+        if upload_url:
+            try:
+                return self._upload(upload_url, path)
+            except Exception as e:
+                print(f"Upload failed, falling back to base64: {e}")
+
+        if key[2] > STREAMING_THRESHOLD:
+            return LocalFileRef(path)
+        return self._encode(path, key, encoding)
+
+    def _upload(self, upload_url, path):
+        from .file_digest import get_file_digest_cache
+        from .result_cache import get_upload_cache
+        cache = get_upload_cache()
+        content_hash = get_file_digest_cache().digest(path)
+        cached = cache.get(content_hash)
+        if cached is not None:
+            return cached["url"]
+
+        from .task_client import get_task_client
+        client = get_task_client()
+        url = client.run(client.upload_file(upload_url, path))
+        print(f"Uploaded {path} to {url}")
+        cache.put(content_hash, {"url": url})
+        return url
+
+    def _encode(self, path, key, encoding):
+        with self._lock:
+            encoded = self._encoded.get(key)
+            if encoded is not None:
+                self._encoded.move_to_end(key)
+                return encoded
+
+        encoded = path_to_base64(path, encoding)
+        if encoded is None:
+            return None
+
+        with self._lock:
+            if key not in self._encoded and len(encoded) <= self._max_cached_bytes:
+                self._encoded[key] = encoded
+                self._encoded_bytes += len(encoded)
+                while self._encoded_bytes > self._max_cached_bytes:
+                    _, evicted = self._encoded.popitem(last=False)
+                    self._encoded_bytes -= len(evicted)
+        return encoded
+
+
+_upload_manager = None
+
+
+def get_upload_manager() -> UploadManager:
+    global _upload_manager
+    if _upload_manager is None:
+        _upload_manager = UploadManager()
+    return _upload_manager
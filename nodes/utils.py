@@ -1,9 +1,16 @@
 import base64
+import functools
+import hashlib
+import inspect
+import json
 import os
 import re
+import sys
 from typing import Optional, Union
 import configparser
 
+from .streaming_body import LocalFileRef
+
 def path_to_base64(image_path: str, encoding: str = 'utf-8') -> Optional[str]:
     """
     将图片文件路径转换为 base64 编码字符串
@@ -29,33 +36,105 @@ def path_to_base64(image_path: str, encoding: str = 'utf-8') -> Optional[str]:
         print(f"转换图片到 base64 时出错: {str(e)}")
         return None
 
-def process_image_path_or_url(path_or_url: str, encoding: str = 'utf-8') -> str:
+def process_image_path_or_url(path_or_url: str, encoding: str = 'utf-8',
+                              provider: Optional[str] = None,
+                              node_class: Optional[str] = None) -> Union[str, LocalFileRef]:
     """
     处理图片路径或URL
     
     参数:
         path_or_url (str): 图片的本地路径或HTTP URL
         encoding (str): 编码方式，默认为 'utf-8'
+        provider (str): 服务名称，启用图片预处理时按该服务的尺寸上限缩放
+        node_class (str): 指标中使用的节点类名
         
     返回:
-        str: 如果输入是URL则直接返回，如果是本地路径则返回base64编码
+        Union[str, LocalFileRef]: 如果输入是URL则直接返回，如果是本地路径则返回上传后的地址、base64编码，
+            大文件返回 LocalFileRef 以便发送时流式编码
     """
     # 使用正则表达式检查是否为HTTP/HTTPS URL
     if re.match(r'^https?://', path_or_url):
         return path_or_url
     else:
-        # 假设是本地路径，尝试转换为base64
-        base64_str = path_to_base64(path_or_url, encoding)
-        if base64_str:
-            return base64_str
+        # 假设是本地路径，按需先缩放压缩，同一个文件只上传/编码一次
+        from .image_preprocess import get_image_preprocessor, preprocess_enabled
+        from .upload_manager import get_upload_manager
+        from .metrics import get_metrics
+        with get_metrics().span("encode", node_class, provider=provider):
+            if provider and preprocess_enabled() and os.path.isfile(path_or_url):
+                path_or_url = get_image_preprocessor().process(path_or_url, provider)
+            handle = get_upload_manager().get_handle(path_or_url, encoding)
+        if handle:
+            return handle
         return path_or_url  # 如果转换失败，返回原始路径
     
 
+def register_route(method: str, path: str, handler):
+    """
+    在 ComfyUI 的 PromptServer 上注册路由
+
+    参数:
+        method (str): "get" 或 "post"
+        path (str): 路由路径
+        handler: aiohttp 请求处理函数
+    """
+    try:
+        from server import PromptServer
+    except ImportError:
+        return
+    # 离线脚本（例如 tools/benchmark.py）导入包时服务还没有启动
+    if PromptServer.instance is None:
+        return
+    getattr(PromptServer.instance.routes, method)(path)(handler)
+
+
+def current_execution():
+    """
+    返回 ComfyUI 正在执行的 (prompt_id, 节点 id)，没有启动服务时返回 (None, None)
+    """
+    try:
+        from server import PromptServer
+    except ImportError:
+        return None, None
+    server = PromptServer.instance
+    if server is None:
+        return None, None
+    return getattr(server, "last_prompt_id", None), getattr(server, "last_node_id", None)
+
+
+def send_executed(prompt_id, node_id, output):
+    """
+    重新向前端发送节点的 executed 消息，前端会按 output 刷新节点的预览
+
+    参数:
+        output (dict): 与节点返回的 ui 相同的格式，例如 {"images": [...]}
+    """
+    from server import PromptServer
+    server = PromptServer.instance
+    server.send_sync("executed", {"node": node_id, "display_node": node_id, "output": output,
+                                  "prompt_id": prompt_id}, getattr(server, "client_id", None))
+
+
+_config_cache = {"signature": None, "config": None}
+
 def get_comfyonline_config():
+    """
+    读取 config.ini，解析结果会被缓存，文件的 mtime 或大小变化时重新解析
+    """
     curr_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))  # 获取上级目录
     comfyonline_config_path = os.path.join(curr_dir, "config.ini")
+    try:
+        stat = os.stat(comfyonline_config_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        signature = None
+    if _config_cache["config"] is not None and _config_cache["signature"] == signature:
+        return _config_cache["config"]
+
     config = configparser.ConfigParser()
     config.read(comfyonline_config_path)
+    _config_cache["signature"] = signature
+    _config_cache["config"] = config
     return config
 
 def get_comfyonline_api_key():
@@ -68,3 +147,55 @@ def get_comfyonline_api_key():
         api_token = env_api_token
     return api_token
 
+
+def _hash_default(o):
+    if isinstance(o, LocalFileRef):
+        return o.cache_key()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def payload_hash(node_class: str, payload: dict) -> str:
+    """
+    计算节点类型加请求参数的规范化哈希
+
+    参数:
+        node_class (str): 节点类名
+        payload (dict): 请求体
+
+    返回:
+        str: sha256 十六进制字符串，相同输入总是得到相同结果
+    """
+    canonical = json.dumps({"node_class": node_class, "payload": payload},
+                           sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_hash_default)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def async_nodes_supported() -> bool:
+    """当前 ComfyUI 是否支持 async def 的节点函数"""
+    execution = sys.modules.get("execution")
+    if execution is None:
+        return False
+    return (hasattr(execution, "_async_map_node_over_list")
+            or inspect.iscoroutinefunction(getattr(execution, "get_output_data", None)))
+
+
+def async_node(cls):
+    """
+    类装饰器：ComfyUI 支持异步节点时，把节点的 FUNCTION 换成 async def 版本
+
+    原函数在线程中执行，等待云端任务时 ComfyUI 可以继续执行同一个工作流中其他独立分支的节点，
+    多个分支的等待时间互相重叠。旧版本的 ComfyUI 保持同步执行。
+    """
+    if not async_nodes_supported():
+        return cls
+    func = getattr(cls, cls.FUNCTION)
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        import asyncio
+        return await asyncio.to_thread(func, self, *args, **kwargs)
+
+    async_name = f"{cls.FUNCTION}_async"
+    setattr(cls, async_name, wrapper)
+    cls.FUNCTION = async_name
+    return cls
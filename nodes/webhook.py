@@ -0,0 +1,48 @@
+import secrets
+
+from .utils import get_comfyonline_config
+
+WEBHOOK_ROUTE = "/hflow/webhook/{secret}"
+
+# 回调地址中的随机密钥，只接受本进程创建的任务的回调
+_secret = secrets.token_urlsafe(16)
+
+
+def webhook_url():
+    """
+    本进程的 webhook 回调地址
+
+    返回:
+        str: 配置了 [comfyonline] webhook_base_url 时返回回调地址，否则返回空字符串
+    """
+    config = get_comfyonline_config()
+    base_url = config.get("comfyonline", "webhook_base_url", fallback="").strip()
+    if not base_url:
+        return ""
+    return base_url.rstrip("/") + WEBHOOK_ROUTE.format(secret=_secret)
+
+
+async def handle_webhook(request):
+    """
+    接收任务完成回调，转交给 PollScheduler 唤醒等待中的节点
+
+    回调内容可以是任务详情本身，也可以是 {"data": 任务详情}，与查询接口的返回格式一致
+    """
+    from aiohttp import web
+    if not secrets.compare_digest(request.match_info.get("secret", ""), _secret):
+        return web.Response(status=403)
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    query_data = data.get("data") if isinstance(data, dict) and isinstance(data.get("data"), dict) else data
+    if not isinstance(query_data, dict) or not query_data.get("task_id"):
+        return web.Response(status=400)
+
+    from .task_client import get_task_client
+    client = get_task_client()
+    # 调度器只在客户端事件循环中访问
+    client.loop.call_soon_threadsafe(
+        lambda: client.get_poll_scheduler().notify(query_data["task_id"], query_data))
+    return web.json_response({"ok": True})
+
@@ -0,0 +1,409 @@
+"""
+离线压测：用本地模拟的 comfyonline 服务驱动所有节点，统计吞吐、延迟、请求数和内存峰值
+
+用法（在 ComfyUI 根目录运行，需要能导入 folder_paths）:
+    python custom_nodes/ComfyUI-H-flow/tools/benchmark.py
+    python custom_nodes/ComfyUI-H-flow/tools/benchmark.py --workloads flux,llm --iterations 16 --concurrency 8
+    python custom_nodes/ComfyUI-H-flow/tools/benchmark.py --error-rate 0.1 --completion lognormal:3,0.5
+    python custom_nodes/ComfyUI-H-flow/tools/benchmark.py --json base.json
+    python custom_nodes/ComfyUI-H-flow/tools/benchmark.py --baseline base.json --tolerance 0.25
+
+每个场景在单独的子进程中运行，内存峰值互不影响；结果缓存、任务日志、轮询统计等文件写到临时目录，
+不会影响正式的 ComfyUI 数据。+anon MB 为匿名内存的增量（不含 mmap 映射的文件页），用于确认大文件的编码和下载是流式的。
+--baseline 用于跟踪回归：p50 延迟、吞吐、API 请求数或内存峰值
+比基线差超过 tolerance 时以非零状态退出。
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TOOLS_DIR = os.path.dirname(os.path.realpath(__file__))
+PACKAGE_DIR = os.path.dirname(TOOLS_DIR)
+PACKAGE_NAME = "hflow_benchmark"
+MOCK_SERVER = os.path.join(TOOLS_DIR, "mock_server.py")
+RESULT_MARKER = "HFLOW_BENCHMARK_RESULT "
+MB = 1024 * 1024
+
+
+class WorkloadContext:
+    """场景的输入：模拟服务地址、本地测试文件，以及每次运行都不同的提示词（避免命中结果缓存和任务日志）"""
+
+    def __init__(self, mock_url, work_dir, large_file_mb):
+        self.mock_url = mock_url
+        self.work_dir = work_dir
+        self.large_file_mb = large_file_mb
+        self.run_id = f"{os.getpid()}-{time.time_ns()}"
+
+    def prompt(self, i):
+        return f"benchmark {self.run_id} #{i}"
+
+    def file_url(self, name, size=None):
+        return f"{self.mock_url}/files/{name}" + (f"?size={size}" if size else "")
+
+    def local_file(self, name, size):
+        """生成指定大小的本地文件，返回路径"""
+        path = os.path.join(self.work_dir, "input", name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                for _ in range(size // MB):
+                    f.write(os.urandom(MB))
+                f.write(os.urandom(size % MB))
+        return path
+
+
+# 场景名 -> (节点模块, 节点类, 调用的方法（None 为 FUNCTION）, 第 i 次调用的参数)
+WORKLOADS = {
+    "flux": ("FluxPro", "FluxProUltra", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), seed=i, aspect_ratio="1:1", raw=False, num_outputs=2)),
+    "hidream": ("HiDreamI1", "HiDreamI1", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), seed=i, aspect_ratio="square_hd", type="hidream-i1-full")),
+    "ideogram": ("IdeogramV2", "IdeogramV2Turbo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), aspect_ratio="1:1", style="auto")),
+    "kling": ("Kling", "KlingImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.file_url("input.png"), aspect_ratio="16:9", duration=5, is_pro=False)),
+    "luma": ("Luma", "LumaRay2ImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.file_url("input.png"))),
+    "runway": ("Runway", "RunwayGen3ImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.file_url("input.png"), aspect_ratio="16:9", duration=5)),
+    "wan2": ("wan2", "Wan2ImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.file_url("input.png"))),
+    "hailuo": ("Hailuo", "Hailuo01ImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.file_url("input.png"))),
+    "llm": ("LLM", "LLMTask", None, lambda i, ctx: dict(
+        model="gpt-4o", prompt=ctx.prompt(i))),
+    "batch": ("BatchImage", "BatchImageGenerate", None, lambda i, ctx: dict(
+        model="FluxProUltra", prompts="\n".join(ctx.prompt(f"{i}.{j}") for j in range(4)),
+        aspect_ratios="1:1, 16:9", seed=i)),
+    "load_image": ("LoadImage", "LoadImage", "IS_CHANGED", lambda i, ctx: dict(
+        image=ctx.local_file(f"load_{i % 4}.png", 16 * MB))),
+    # 并发下载多个输出文件，统计下载吞吐
+    "save_image": ("SaveImage", "SaveImage", None, lambda i, ctx: dict(
+        image_urls="\n".join(ctx.file_url(f"{i}_{j}.png") for j in range(8)), filename_prefix=f"bench_{i}")),
+    # 大文件分段下载
+    "save_video_large": ("SaveVideo", "SaveVideo", None, lambda i, ctx: dict(
+        video_urls=ctx.file_url(f"{i}.mp4", ctx.large_file_mb * MB), filename_prefix=f"bench_{i}")),
+    # 大的本地图片在发送请求时流式编码，内存峰值不应随文件大小增长
+    "upload_large": ("Kling", "KlingImageToVideo", None, lambda i, ctx: dict(
+        prompt=ctx.prompt(i), image_url=ctx.local_file("large.png", ctx.large_file_mb * MB),
+        aspect_ratio="16:9", duration=5, is_pro=False)),
+}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+class AnonMemorySampler:
+    """
+    后台采样匿名内存（/proc/self/status 的 RssAnon）的峰值
+
+    ru_maxrss 包含 mmap 映射的文件页，流式编码和摘要计算通过 mmap 读取文件，
+    文件页可以随时被回收，不代表真实的内存占用，因此单独统计匿名内存。仅 Linux 可用。
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.available = self.current_mb() is not None
+        self.peak_mb = self.current_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_mb():
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+
+    def __enter__(self):
+        if self.available:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.available:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+
+
+def percentile(values, q):
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * q / 100 + 0.5) - 1))]
+
+
+def load_package(comfyui_root):
+    """与 ComfyUI 加载自定义节点的方式相同，通过 spec 从目录加载包"""
+    sys.path.insert(0, comfyui_root)
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def isolate_state(work_dir):
+    """把各个单例换成写到临时目录的实例，并把输入输出目录指向临时目录"""
+    nodes = f"{PACKAGE_NAME}.nodes"
+    result_cache = importlib.import_module(f"{nodes}.result_cache")
+    task_journal = importlib.import_module(f"{nodes}.task_journal")
+    polling_policy = importlib.import_module(f"{nodes}.polling_policy")
+    file_digest = importlib.import_module(f"{nodes}.file_digest")
+    metrics = importlib.import_module(f"{nodes}.metrics")
+    result_cache._result_cache = result_cache.ResultCache(path=os.path.join(work_dir, "result_cache.db"))
+    result_cache._llm_cache = result_cache.ResultCache(path=os.path.join(work_dir, "llm_cache.db"))
+    result_cache._upload_cache = result_cache.ResultCache(path=os.path.join(work_dir, "upload_cache.db"))
+    task_journal._task_journal = task_journal.TaskJournal(os.path.join(work_dir, "task_journal.db"))
+    polling_policy._polling_policy = polling_policy.PollingPolicy(os.path.join(work_dir, "polling_stats.json"))
+    file_digest._file_digest_cache = file_digest.FileDigestCache(os.path.join(work_dir, "file_digests.json"))
+    metrics._metrics = metrics.Metrics(jsonl_path=None)
+
+    import folder_paths
+    for name in ("output", "input"):
+        os.makedirs(os.path.join(work_dir, name), exist_ok=True)
+    folder_paths.set_output_directory(os.path.join(work_dir, "output"))
+    folder_paths.set_input_directory(os.path.join(work_dir, "input"))
+
+
+def run_worker(args):
+    """在子进程中运行一个场景，最后一行输出 JSON 结果"""
+    load_package(args.comfyui_root)
+    isolate_state(args.work_dir)
+    rss_after_import = peak_rss_mb()
+
+    module_name, class_name, method, make_inputs = WORKLOADS[args.worker]
+    node_class = getattr(importlib.import_module(f"{PACKAGE_NAME}.nodes.{module_name}"), class_name)
+    ctx = WorkloadContext(args.mock_url, args.work_dir, args.large_file_mb)
+    # 生成测试文件不计入耗时
+    inputs = [make_inputs(i, ctx) for i in range(args.iterations)]
+
+    def call(i):
+        func = getattr(node_class(), method or node_class.FUNCTION)
+        start = time.perf_counter()
+        output = func(**inputs[i])
+        if inspect.iscoroutine(output):
+            output = asyncio.run(output)
+        latency = time.perf_counter() - start
+        result = output.get("result", ()) if isinstance(output, dict) else output
+        if not isinstance(result, (tuple, list)):
+            result = (result,)
+        failed = any(isinstance(value, str) and "Error" in value for value in result)
+        return latency, failed
+
+    anon_after_import = AnonMemorySampler.current_mb()
+    start = time.perf_counter()
+    with AnonMemorySampler() as anon, concurrent.futures.ThreadPoolExecutor(args.concurrency) as pool:
+        outcomes = list(pool.map(call, range(args.iterations)))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in outcomes]
+    print(RESULT_MARKER + json.dumps({
+        "calls": len(outcomes),
+        "errors": sum(failed for _, failed in outcomes),
+        "wall_s": wall,
+        "calls_per_s": len(outcomes) / wall if wall else None,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rss_import_mb": rss_after_import,
+        "peak_rss_mb": peak_rss_mb(),
+        "anon_import_mb": anon_after_import,
+        "peak_anon_mb": anon.peak_mb,
+    }), flush=True)
+
+
+def fetch_stats(mock_url):
+    with urllib.request.urlopen(f"{mock_url}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+def start_mock_server(args):
+    command = [sys.executable, MOCK_SERVER, "--port", str(args.port), "--completion", args.completion,
+               "--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate),
+               "--failure-rate", str(args.failure_rate), "--output-size", args.output_size]
+    process = subprocess.Popen(command)
+    mock_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            fetch_stats(mock_url)
+            return process, mock_url
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("mock server failed to start")
+            time.sleep(0.1)
+
+
+def run_workload(name, args, mock_url):
+    """运行一个场景，返回结果和该场景期间模拟服务收到的请求"""
+    env = dict(os.environ, COMFYONLINE_API_BASE=f"{mock_url}/api", COMFYONLINE_TOKEN="benchmark")
+    before = fetch_stats(mock_url)
+    with tempfile.TemporaryDirectory(prefix="hflow-benchmark-") as work_dir:
+        command = [sys.executable, os.path.realpath(__file__), "--worker", name, "--work-dir", work_dir,
+                   "--mock-url", mock_url, "--comfyui-root", args.comfyui_root,
+                   "--iterations", str(args.iterations), "--concurrency", str(args.concurrency),
+                   "--large-file-mb", str(args.large_file_mb)]
+        process = subprocess.run(command, capture_output=True, text=True, cwd=args.comfyui_root, env=env)
+    after = fetch_stats(mock_url)
+
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+    if process.returncode != 0 or not lines:
+        raise RuntimeError(f"workload {name} failed:\n{process.stderr[-2000:]}")
+    result = json.loads(lines[-1][len(RESULT_MARKER):])
+
+    requests = {key: value - before["requests"].get(key, 0) for key, value in after["requests"].items()}
+    result["creates"] = sum(v for k, v in requests.items() if k.startswith("create_") and ":" not in k)
+    result["queries"] = sum(v for k, v in requests.items() if k.startswith("query_") and ":" not in k)
+    result["api_requests"] = result["creates"] + result["queries"] + requests.get("upload", 0)
+    result["http_503"] = sum(v for k, v in requests.items() if k.endswith(":503"))
+    result["file_requests"] = requests.get("files", 0)
+    result["download_mb"] = (after["bytes_sent"] - before["bytes_sent"]) / MB
+    result["download_mb_per_s"] = result["download_mb"] / result["wall_s"] if result["wall_s"] else None
+    return result
+
+
+# 报告列: (标题, 宽度, 格式, 结果字段)
+REPORT_COLUMNS = [
+    ("calls", 6, "{}", "calls"),
+    ("err", 4, "{}", "errors"),
+    ("calls/s", 8, "{:.2f}", "calls_per_s"),
+    ("p50 ms", 8, "{:.0f}", "p50_ms"),
+    ("p99 ms", 8, "{:.0f}", "p99_ms"),
+    ("create", 7, "{}", "creates"),
+    ("query", 6, "{}", "queries"),
+    ("503", 5, "{}", "http_503"),
+    ("files", 6, "{}", "file_requests"),
+    ("MB/s", 8, "{:.1f}", "download_mb_per_s"),
+    ("rss MB", 7, "{:.0f}", "peak_rss_mb"),
+    ("+rss MB", 8, "{:.0f}", "workload_rss_mb"),
+    ("+anon MB", 9, "{:.0f}", "workload_anon_mb"),
+]
+
+# 与基线比较的字段: (字段, 数值越大越好)
+REGRESSION_FIELDS = [("p50_ms", False), ("calls_per_s", True), ("api_requests", False), ("peak_rss_mb", False),
+                     ("peak_anon_mb", False)]
+
+
+def print_report(results):
+    print(f"{'workload':18}" + "".join(f"{title:>{width + 1}}" for title, width, _, _ in REPORT_COLUMNS))
+    for name, result in results.items():
+        cells = []
+        for _, width, fmt, key in REPORT_COLUMNS:
+            value = result.get(key)
+            cells.append(f"{fmt.format(value) if value is not None else '-':>{width + 1}}")
+        print(f"{name:18}" + "".join(cells))
+
+
+def compare_baseline(results, baseline, tolerance):
+    """返回比基线差超过 tolerance 的项"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key, higher_is_better in REGRESSION_FIELDS:
+            current, previous = result.get(key), base.get(key)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}.{key}: {previous:.2f} -> {current:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comfyui-root", default=os.getcwd())
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma separated, default: all")
+    parser.add_argument("--iterations", type=int, default=8, help="node calls per workload")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent node calls per workload")
+    parser.add_argument("--large-file-mb", type=int, default=128, help="file size for the *_large workloads")
+    parser.add_argument("--port", type=int, default=18700)
+    parser.add_argument("--completion", default="uniform:1,3", help="see tools/mock_server.py")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output-size", default="1MB")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from a previous --json run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    # 子进程参数
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--mock-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    names = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)} (available: {', '.join(WORKLOADS)})")
+
+    mock_process, mock_url = start_mock_server(args)
+    results = {}
+    try:
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr, flush=True)
+            result = run_workload(name, args, mock_url)
+            if result.get("rss_import_mb") is not None:
+                result["workload_rss_mb"] = result["peak_rss_mb"] - result["rss_import_mb"]
+            if result.get("anon_import_mb") is not None:
+                result["workload_anon_mb"] = result["peak_anon_mb"] - result["anon_import_mb"]
+            results[name] = result
+    finally:
+        mock_process.terminate()
+        mock_process.wait()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nregressions (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
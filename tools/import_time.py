@@ -0,0 +1,83 @@
+"""
+统计 H-flow 包的导入耗时（python -X importtime）
+
+用法（在 ComfyUI 根目录运行，需要能导入 folder_paths）:
+    python custom_nodes/ComfyUI-H-flow/tools/import_time.py
+    python custom_nodes/ComfyUI-H-flow/tools/import_time.py --budget-ms 50
+
+--budget-ms 用于跟踪回归：导入耗时超过预算时以非零状态退出。
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PACKAGE_NAME = "hflow_import_probe"
+
+# 与 ComfyUI 加载自定义节点的方式相同，通过 spec 从目录加载包
+IMPORT_SNIPPET = f"""
+import importlib.util, sys, time
+sys.path.insert(0, {{comfyui_root!r}})
+spec = importlib.util.spec_from_file_location(
+    {PACKAGE_NAME!r}, {os.path.join(PACKAGE_DIR, "__init__.py")!r},
+    submodule_search_locations=[{PACKAGE_DIR!r}])
+module = importlib.util.module_from_spec(spec)
+sys.modules[{PACKAGE_NAME!r}] = module
+print("HFLOW_START", file=sys.stderr, flush=True)
+start = time.perf_counter()
+spec.loader.exec_module(module)
+print("HFLOW_END", int((time.perf_counter() - start) * 1e6), file=sys.stderr, flush=True)
+"""
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(comfyui_root):
+    """
+    返回 (包导入总耗时 us, [(模块名, self_us, cumulative_us)])，只统计加载包期间发生的导入
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET.format(comfyui_root=comfyui_root)],
+        capture_output=True, text=True, cwd=comfyui_root)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    rows = []
+    total_us = None
+    in_package = False
+    for line in result.stderr.splitlines():
+        if line == "HFLOW_START":
+            in_package = True
+        elif line.startswith("HFLOW_END"):
+            total_us = int(line.split()[1])
+            in_package = False
+        elif in_package:
+            match = LINE_PATTERN.match(line)
+            if match:
+                self_us, cumulative_us, _, name = match.groups()
+                rows.append((name, int(self_us), int(cumulative_us)))
+    return total_us, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comfyui-root", default=os.getcwd())
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    total_us, rows = measure(args.comfyui_root)
+
+    print(f"{'module':60} {'self ms':>9} {'cumul ms':>9}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:60} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}")
+    print(f"\ntotal package import time: {total_us / 1000:.1f} ms")
+
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"over budget ({args.budget_ms} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
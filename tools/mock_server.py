@@ -0,0 +1,253 @@
+"""
+comfyonline API 的本地模拟服务，用于离线压测和故障注入
+
+用法:
+    python tools/mock_server.py --port 18700 --completion uniform:1,3 --error-rate 0.05 --output-size 2MB
+    COMFYONLINE_API_BASE=http://127.0.0.1:18700/api 启动 ComfyUI 后节点会请求该服务
+
+模拟的接口:
+    POST /api/un-api/<create_*_task>        创建任务，相同 Idempotency-Key 返回同一个任务
+    POST /api/un-api/create_LLM_task        创建 LLM 任务，运行中返回逐步增长的部分结果
+    POST /api/query_app_general_detail      查询任务
+    POST /api/query_app_general_detail_batch  批量查询（对应 config.ini 的 batch_query_url）
+    POST /api/upload                        上传文件（对应 config.ini 的 upload_url）
+    GET  /files/<name>[?size=字节数]         输出文件，支持 HEAD 和 Range
+    GET  /stats                             各接口的请求数
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import math
+import random
+import re
+import time
+
+import aiohttp
+from aiohttp import web
+
+FILE_CHUNK_SIZE = 256 * 1024
+LLM_TEXT = ("The quick brown fox jumps over the lazy dog while the cloud renders another frame "
+            "of the requested scene with careful attention to light and motion.").split()
+
+
+def parse_size(value):
+    """解析 512KB / 2MB / 1GB 形式的大小"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)?\s*", value, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    unit = (match.group(2) or "").upper().rstrip("B")
+    return int(float(match.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[unit])
+
+
+def parse_distribution(value):
+    """
+    解析完成时间分布，返回无参数的采样函数
+
+    格式: const:秒 | uniform:最小,最大 | lognormal:中位数,sigma
+    """
+    kind, _, args = value.partition(":")
+    try:
+        params = [float(x) for x in args.split(",")] if args else []
+        if kind == "const" and len(params) == 1:
+            return lambda: params[0]
+        if kind == "uniform" and len(params) == 2:
+            return lambda: random.uniform(params[0], params[1])
+        if kind == "lognormal" and len(params) == 2:
+            return lambda: random.lognormvariate(math.log(params[0]), params[1])
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid distribution: {value}")
+
+
+class MockComfyOnline:
+    """
+    模拟 comfyonline 的任务生命周期
+
+    任务创建后按 completion 分布决定完成时间，之前查询返回 RUNNING，之后返回 COMPLETED 和输出地址。
+    error_rate 为 API 请求返回 503 的概率，latency 为每个 API 请求的额外延迟（秒）。
+    """
+
+    def __init__(self, completion=lambda: 1.0, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 output_size=1024 * 1024, failure_rate=0.0):
+        self.completion = completion
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.output_size = output_size
+        self.failure_rate = failure_rate
+        self.requests = collections.Counter()
+        self.bytes_sent = 0
+        self._tasks = {}
+        self._idempotency_keys = {}
+        self._ids = itertools.count(1)
+        self._pattern = bytes(range(256)) * (FILE_CHUNK_SIZE // 256)
+
+    def make_app(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/api/un-api/{endpoint}", self.create_task)
+        app.router.add_post("/api/query_app_general_detail", self.query_task)
+        app.router.add_post("/api/query_app_general_detail_batch", self.query_batch)
+        app.router.add_post("/api/upload", self.upload)
+        app.router.add_get("/files/{name}", self.serve_file)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+    async def _simulate_api(self, endpoint):
+        """记录请求、模拟延迟，按 error_rate 返回 503"""
+        self.requests[endpoint] += 1
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self.requests[f"{endpoint}:503"] += 1
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return None
+
+    async def create_task(self, request):
+        endpoint = request.match_info["endpoint"]
+        error = await self._simulate_api(endpoint)
+        if error is not None:
+            return error
+        body = await request.json()
+        key = request.headers.get("Idempotency-Key")
+        if key and key in self._idempotency_keys:
+            self.requests[f"{endpoint}:duplicate"] += 1
+            return web.json_response({"data": {"task_id": self._idempotency_keys[key]}})
+
+        task_id = f"mock-{next(self._ids)}"
+        now = time.monotonic()
+        self._tasks[task_id] = {
+            "endpoint": endpoint,
+            "created_at": now,
+            "done_at": now + max(0.0, self.completion()),
+            "outputs": max(1, int(body.get("num_outputs") or 1)),
+            "failed": bool(self.failure_rate) and random.random() < self.failure_rate,
+            "base_url": f"{request.scheme}://{request.host}",
+        }
+        if key:
+            self._idempotency_keys[key] = task_id
+        if body.get("webhook"):
+            asyncio.ensure_future(self._send_webhook(task_id, body["webhook"]))
+        return web.json_response({"data": {"task_id": task_id}})
+
+    def _task_detail(self, task_id):
+        task = self._tasks.get(task_id)
+        if task is None:
+            return {"task_id": task_id, "status": "FAILED", "error_message": "Unknown task"}
+        now = time.monotonic()
+        is_llm = task["endpoint"] == "create_LLM_task"
+        if now < task["done_at"]:
+            detail = {"task_id": task_id, "status": "RUNNING"}
+            if is_llm:
+                progress = (now - task["created_at"]) / max(task["done_at"] - task["created_at"], 1e-6)
+                words = LLM_TEXT[:max(1, int(len(LLM_TEXT) * progress))]
+                detail["llm_output"] = {"choices": [{"delta": {"content": " ".join(words)}}]}
+            return detail
+        if task["failed"]:
+            return {"task_id": task_id, "status": "FAILED", "error_message": "Injected failure"}
+        detail = {"task_id": task_id, "status": "COMPLETED"}
+        if is_llm:
+            detail["llm_output"] = {"choices": [{"message": {"content": " ".join(LLM_TEXT)}}]}
+        else:
+            extension = "mp4" if "video" in task["endpoint"] or "kling" in task["endpoint"] else "png"
+            detail["output"] = {"output_url_list": [f"{task['base_url']}/files/{task_id}_{i}.{extension}"
+                                                    for i in range(task["outputs"])]}
+        return detail
+
+    async def _send_webhook(self, task_id, url):
+        task = self._tasks[task_id]
+        await asyncio.sleep(max(0.0, task["done_at"] - time.monotonic()))
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json={"data": self._task_detail(task_id)}) as response:
+                    self.requests[f"webhook:{response.status}"] += 1
+        except aiohttp.ClientError:
+            self.requests["webhook:error"] += 1
+
+    async def query_task(self, request):
+        error = await self._simulate_api("query_app_general_detail")
+        if error is not None:
+            return error
+        body = await request.json()
+        return web.json_response({"data": self._task_detail(body.get("task_id"))})
+
+    async def query_batch(self, request):
+        error = await self._simulate_api("query_app_general_detail_batch")
+        if error is not None:
+            return error
+        body = await request.json()
+        return web.json_response({"data": [self._task_detail(task_id) for task_id in body.get("task_ids", [])]})
+
+    async def upload(self, request):
+        error = await self._simulate_api("upload")
+        if error is not None:
+            return error
+        reader = await request.multipart()
+        size = 0
+        async for part in reader:
+            while chunk := await part.read_chunk():
+                size += len(chunk)
+        return web.json_response({"data": {"url": f"{request.scheme}://{request.host}/files/upload-{size}.png"}})
+
+    async def serve_file(self, request):
+        self.requests["files"] += 1
+        # ?size= 覆盖默认的输出大小，用于单独测试大文件下载
+        size = int(request.query.get("size", self.output_size))
+        start, end = 0, size - 1
+        status = 200
+        headers = {"Accept-Ranges": "bytes", "Content-Type": "application/octet-stream"}
+        range_header = request.headers.get("Range")
+        if range_header:
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header)
+            if not match or int(match.group(1)) >= size:
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+        position = start
+        while position <= end:
+            offset = position % len(self._pattern)
+            chunk = self._pattern[offset:offset + min(end + 1 - position, len(self._pattern) - offset)]
+            await response.write(chunk)
+            position += len(chunk)
+            self.bytes_sent += len(chunk)
+        await response.write_eof()
+        return response
+
+    async def stats(self, request):
+        return web.json_response({"requests": dict(self.requests), "tasks": len(self._tasks),
+                                  "bytes_sent": self.bytes_sent})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18700)
+    parser.add_argument("--completion", type=parse_distribution, default="uniform:1,3",
+                        help="task completion time: const:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--latency-ms", type=float, default=20, help="extra latency per API request")
+    parser.add_argument("--latency-jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 503 per API request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability that a task ends FAILED")
+    parser.add_argument("--output-size", type=parse_size, default="1MB")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    mock = MockComfyOnline(completion=args.completion, latency=args.latency_ms / 1000,
+                           latency_jitter=args.latency_jitter_ms / 1000, error_rate=args.error_rate,
+                           output_size=args.output_size, failure_rate=args.failure_rate)
+    web.run_app(mock.make_app(), host=args.host, port=args.port, print=lambda *_: None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 import { app } from "../../../scripts/app.js";
 import { ComfyWidgets } from "../../../scripts/widgets.js";
+import { api } from "../../../scripts/api.js";
 
 // Displays input text on a node
 app.registerExtension({
 	name: "H-flow.Text",
+	setup() {
+		// LLMTask 流式模式下推送的部分结果
+		api.addEventListener("hflow.llm.partial", ({ detail }) => {
+			const node = app.graph.getNodeById(detail.node);
+			node?.onPartialText?.(detail.text);
+		});
+	},
 	async beforeRegisterNodeDef(nodeType, nodeData, app) {
 		if (nodeData.name === "TestText" || nodeData.name === "LLMTask") {
 			function populate(text) {
@@ -57,6 +65,10 @@ app.registerExtension({
 				populate.call(this, message.text);
 			};
 
+			nodeType.prototype.onPartialText = function (text) {
+				populate.call(this, [text]);
+			};
+
 			const onConfigure = nodeType.prototype.onConfigure;
 			// nodeType.prototype.onConfigure = function () {
 			// 	onConfigure?.apply(this, arguments);